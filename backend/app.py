@@ -1,13 +1,84 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import os
+import json
 import uuid
 import logging
+import mimetypes
+import re
+import cv2
 from config import logger
-from graph import tool_agent
+from graph import get_tool_agent
+from sessions import get_session
+from jobs import get_job_runner, QueueFull
+from tools import iter_analysis, render_overlays, render_keyframe
+from frame_table import serialize_results, deserialize_results, keyframe_metrics
+from warmup import start_warm_up, warm_up_status
+import result_cache
+from result_cache import hash_file, known_hash
+from config import MEDIA_MAX_AGE, MEDIA_OFFLOAD, MEDIA_ACCEL_PREFIX, WARMUP_ON_START, COMPARE_TOP_K
+from uploads import create_upload, get_upload, upload_extension, UploadConflict
+from metrics import render as render_metrics, trace_request
+from strokes import get_template_library, save_template, compare_to_templates
+from history import get_history_store, SESSION_METRICS
+from datetime import datetime
 
 app = Flask(__name__)
 CORS(app)
+app.config['USE_X_SENDFILE'] = MEDIA_OFFLOAD is not None
+
+# Models, graph and codec are built in the background; /health reports 503 until done.
+# Never at import: spawned worker processes re-import this module as __mp_main__.
+@app.before_request
+def ensure_warm_up():
+    """Under a WSGI server the first request (typically a /health probe) starts the warm-up."""
+    if WARMUP_ON_START:
+        start_warm_up()
+
+def _timestamp(value):
+    """Unix time from an ISO 8601 date or datetime, or None when not given."""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def record_session(player_id, video_path, results, recorded_at=None):
+    """Add an analysis to the player's history; failures are logged, never raised."""
+    try:
+        return get_history_store().record(player_id, results, hash_file(video_path), video_path, _timestamp(recorded_at))
+    except Exception as e:
+        logger.error(f"Could not record session for player {player_id}: {e}")
+        return None
+
+UUID_NAME = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+def send_media(file_path, mimetype):
+    """send_file with Range/206 support, an ETag and cache headers.
+
+    The ETag is the content hash when one is already known (recorded at upload
+    or by an analysis), else a size+mtime validator, so serving a file never
+    waits on hashing it. Uploads and outputs are uuid-named and never
+    rewritten, so they are cached as immutable; anything else is revalidated
+    against its ETag. With MEDIA_OFFLOAD set, the body is left to the
+    front-end server.
+    """
+    # Flask resolves relative paths against the app root, not the working directory.
+    file_path = os.path.abspath(file_path)
+    immutable = UUID_NAME.search(os.path.basename(file_path)) is not None
+    stat = os.stat(file_path)
+    response = send_file(
+        file_path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=known_hash(file_path) or f"{stat.st_size:x}-{stat.st_mtime_ns:x}",
+        max_age=MEDIA_MAX_AGE if immutable else None,
+    )
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    if MEDIA_OFFLOAD == 'x-accel':
+        response.headers.pop('X-Sendfile', None)
+        relative_path = os.path.relpath(file_path, os.getcwd())
+        response.headers['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + relative_path.replace(os.sep, '/')
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
 @app.route('/upload', methods=['POST'])
 def upload_video():
@@ -22,7 +93,7 @@ def upload_video():
     upload_dir = "static/uploads"
     os.makedirs(upload_dir, exist_ok=True)
     
-    file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else 'mp4'
+    file_extension = upload_extension(file.filename)
     filename = os.path.join(upload_dir, f"{uuid.uuid4()}.{file_extension}")
     
     try:
@@ -36,6 +107,74 @@ def upload_video():
         logger.error(f"Failed to save video: {str(e)}")
         return jsonify({"error": f"Failed to save video: {str(e)}"}), 500
 
+def upload_status(upload):
+    status = {
+        "upload_id": upload.id,
+        "offset": upload.offset,
+        "length": upload.length,
+        "complete": upload.complete,
+        "metadata": upload.metadata
+    }
+    if upload.complete:
+        status.update({
+            "video_path": upload.video_path,
+            "content_hash": upload.content_hash,
+            "duplicate": upload.duplicate
+        })
+    return status
+
+@app.route('/uploads', methods=['POST'])
+def create_resumable_upload():
+    """Start a resumable upload. Length comes from Upload-Length or the JSON body."""
+    data = request.get_json(silent=True) or {}
+    try:
+        length = int(request.headers.get('Upload-Length', data.get('length', '')))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Upload length required"}), 400
+    if length <= 0:
+        return jsonify({"error": "Upload length must be positive"}), 400
+    
+    upload = create_upload(length, data.get('filename', ''))
+    response = jsonify(upload_status(upload))
+    response.headers['Location'] = f"/uploads/{upload.id}"
+    response.headers['Upload-Offset'] = str(upload.offset)
+    return response, 201
+
+@app.route('/uploads/<upload_id>', methods=['HEAD', 'GET'])
+def get_resumable_upload(upload_id):
+    """Report how many bytes have arrived, so a client can resume from there."""
+    upload = get_upload(upload_id)
+    if upload is None:
+        return jsonify({"error": f"Upload not found: {upload_id}"}), 404
+    
+    response = jsonify(upload_status(upload))
+    response.headers['Upload-Offset'] = str(upload.offset)
+    response.headers['Upload-Length'] = str(upload.length)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def append_resumable_upload(upload_id):
+    """Append the request body at Upload-Offset, streaming it to disk."""
+    upload = get_upload(upload_id)
+    if upload is None:
+        return jsonify({"error": f"Upload not found: {upload_id}"}), 404
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Upload-Offset header required"}), 400
+    
+    try:
+        upload.append(request.stream, offset)
+    except UploadConflict as e:
+        response = jsonify({"error": str(e), "offset": upload.offset})
+        response.headers['Upload-Offset'] = str(upload.offset)
+        return response, 409
+    
+    response = jsonify(upload_status(upload))
+    response.headers['Upload-Offset'] = str(upload.offset)
+    return response
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Chat endpoint for processing requests."""
@@ -43,6 +182,8 @@ def chat():
         data = request.get_json()
         user_message = data.get('message', '')
         video_path = data.get('video_path', '')
+        session_id = data.get('session_id') or str(uuid.uuid4())
+        compact = data.get('response_format') == 'compact'
         
         if not user_message:
             return jsonify({"error": "Message is required"}), 400
@@ -64,7 +205,10 @@ def chat():
             "output_video_path": "",
             "analysis_results": {},
             "video_path": video_path,
-            "frame_data": []
+            "frame_data": [],
+            "session_id": session_id,
+            "structured_output": bool(data.get('structured_output')),
+            "analysis_only": bool(data.get('analysis_only'))
         }
         
         if video_path:
@@ -74,8 +218,9 @@ def chat():
                 "data_path": video_path
             }]
         
-        # Invoke the tool agent
-        result = tool_agent.invoke(initial_state)
+        # Invoke the tool agent, collecting per-stage timings when a trace is asked for
+        with trace_request() as trace:
+            result = get_tool_agent().invoke(initial_state)
         
         # Prepare response with proper structure for React frontend
         response_data = {
@@ -84,17 +229,20 @@ def chat():
             "analysis_results": {},
             "current_variables": result.get("current_variables", {}),
             "messages": [],
-            "output_video": None
+            "output_video": None,
+            "session_id": session_id
         }
+        if data.get('trace'):
+            response_data["trace"] = trace.to_dict()
         
         # Process messages and create intermediate outputs
         assistant_messages = []
         for msg in result.get("messages", []):
             try:
-                role = msg.get('role', 'assistant')
-                content = msg.get('content', str(msg))
+                role = "assistant" if msg.type == "ai" else msg.type
+                content = msg.content
                 
-                if role == "assistant":
+                if role == "assistant" and content:
                     assistant_messages.append({
                         "role": role,
                         "content": content
@@ -108,31 +256,40 @@ def chat():
             "content": user_message
         })
         
-        # Handle video analysis results
-        from tools import analysis_cache
-        if analysis_cache.get("output_video_path") and os.path.exists(analysis_cache["output_video_path"]):
+        # Handle video analysis results carried back in this request's graph state
+        analysis_results = result.get("analysis_results") or {}
+        # Follow-up questions return no analysis; keep the session's last one for them.
+        if analysis_results:
+            get_session(session_id).analysis_results = analysis_results
+        if analysis_results and data.get('player_id'):
+            response_data["history_session_id"] = record_session(
+                data['player_id'], video_path, analysis_results, data.get('recorded_at'))
+        # Analysis-only runs carry results without an annotated video.
+        output_video_path = analysis_results.get("output_video_path")
+        has_video = bool(output_video_path) and os.path.exists(output_video_path)
+        if analysis_results:
             try:
-                video_url = f"http://localhost:5001/video/{analysis_cache['output_video_path']}"
+                video_url = f"http://localhost:5001/video/{output_video_path}" if has_video else None
                 
                 # Create analysis summary
                 analysis_summary = f"""
 🏏 **Cricket Batting Analysis Complete!**
 
 📊 **Analysis Results:**
-- Total frames processed: {analysis_cache.get('total_frames', 0)}
-- Video file size: {analysis_cache.get('video_size', 0)} bytes
+- Total frames processed: {analysis_results.get('total_frames', 0)}
+- Video file size: {analysis_results.get('video_size', 0) if has_video else 'not rendered'}{' bytes' if has_video else ''}
 
 🏥 **Injury Risk Assessment:**
 """
                 
-                if analysis_cache.get('max_injury_risk'):
-                    for joint, risk in analysis_cache['max_injury_risk'].items():
+                if analysis_results.get('max_injury_risk'):
+                    for joint, risk in analysis_results['max_injury_risk'].items():
                         risk_emoji = "🔴" if risk == "High" else "🟡" if risk == "Moderate" else "🟢"
                         analysis_summary += f"\n- {joint.capitalize()}: {risk_emoji} {risk} Risk"
                 
-                if analysis_cache.get('exercises'):
+                if analysis_results.get('exercises'):
                     analysis_summary += f"\n\n💪 **Recommended Exercises:**"
-                    for exercise in analysis_cache['exercises']:
+                    for exercise in analysis_results['exercises']:
                         analysis_summary += f"\n• **{exercise['exercise']}**: {exercise['description']}"
                 
                 # Create intermediate output
@@ -144,15 +301,18 @@ def chat():
                 }
                 
                 response_data["intermediate_outputs"] = [intermediate_output]
-                response_data["analysis_results"] = analysis_cache
+                serialized_results = serialize_results(analysis_results, compact)
+                response_data["analysis_results"] = serialized_results
+                if assistant_messages:
+                    response_data["narration"] = assistant_messages[-1]["content"]
                 
                 # Format response for React
                 formatted_response = [
                     "Video analysis completed successfully",
                     {
                         "intermediate_outputs": [intermediate_output],
-                        "output_video_path": analysis_cache["output_video_path"],
-                        "analysis_results": analysis_cache
+                        "output_video_path": output_video_path or "",
+                        "analysis_results": serialized_results
                     }
                 ]
                 
@@ -162,14 +322,14 @@ def chat():
                     "video": video_url
                 })
                 
-                response_data["output_video"] = {
-                    "path": analysis_cache["output_video_path"],
-                    "url": video_url,
-                    "message": "Video analysis completed with pose estimation",
-                    "size": analysis_cache.get('video_size', 0)
-                }
-                
-                logger.debug(f"Prepared video response with URL: {video_url}")
+                if has_video:
+                    response_data["output_video"] = {
+                        "path": output_video_path,
+                        "url": video_url,
+                        "message": "Video analysis completed with pose estimation",
+                        "size": analysis_results.get('video_size', 0)
+                    }
+                    logger.debug(f"Prepared video response with URL: {video_url}")
                 
             except Exception as e:
                 logger.error(f"Error preparing video response: {e}")
@@ -198,6 +358,252 @@ def chat():
             "messages": [{"role": "assistant", "content": f"An error occurred: {str(e)}"}]
         }), 500
 
+@app.route('/analyze/stream', methods=['GET', 'POST'])
+def analyze_stream():
+    """Stream per-frame results and progress while a video is analysed.
+    
+    Emits newline-delimited JSON by default, or server-sent events with
+    format=sse. Each event is sent as soon as it is produced; the final
+    "result" event carries the summary without the already-streamed frames.
+    """
+    data = request.get_json(silent=True) or {}
+    video_path = data.get('video_path') or request.args.get('video_path', '')
+    stream_format = data.get('format') or request.args.get('format', 'ndjson')
+    include_trace = bool(data.get('trace') or request.args.get('trace'))
+    render = str(data.get('render', request.args.get('render', '1'))).lower() not in ('0', 'false', 'no')
+    player_id = data.get('player_id') or request.args.get('player_id')
+    recorded_at = data.get('recorded_at') or request.args.get('recorded_at')
+    if not video_path or not os.path.exists(video_path):
+        return jsonify({"error": f"Video file not found at {video_path}"}), 400
+    
+    def events():
+        with trace_request() as trace:
+            for event in iter_analysis(video_path, render=render):
+                if event["event"] == "result":
+                    if player_id:
+                        record_session(player_id, video_path, event["results"], recorded_at)
+                    event = {
+                        "event": "result",
+                        "summary": event["summary"],
+                        "analysis_results": {k: v for k, v in event["results"].items() if k != "frame_table"}
+                    }
+                    if include_trace:
+                        event["trace"] = trace.to_dict()
+                if stream_format == 'sse':
+                    yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                else:
+                    yield json.dumps(event) + "\n"
+    
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    response = Response(events(), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/render', methods=['POST'])
+def render_overlay_video():
+    """Render an annotated video from a stored analysis, optionally for a frame range only.
+    
+    The range is start_frame/end_frame, or a swing phase name ("downswing",
+    ...) from the analysis' swing_index. Uses the landmarks saved with the
+    analysis, so no pose estimation runs; the clip must have been analysed
+    already (analysis-only runs are enough).
+    """
+    data = request.get_json(silent=True) or {}
+    video_path = data.get('video_path', '')
+    if not video_path or not os.path.exists(video_path):
+        return jsonify({"error": f"Video file not found at {video_path}"}), 400
+    try:
+        start_frame = int(data['start_frame']) if data.get('start_frame') is not None else None
+        end_frame = int(data['end_frame']) if data.get('end_frame') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "start_frame and end_frame must be integers"}), 400
+    
+    cached = result_cache.load(result_cache.cache_key(hash_file(video_path)))
+    if cached is None:
+        return jsonify({"error": f"No analysis found for {video_path}; analyse it first"}), 404
+    results, landmarks = cached
+    
+    phase = data.get('phase')
+    if phase:
+        span = ((results.get("swing_index") or {}).get("phases") or {}).get(phase)
+        if span is None:
+            return jsonify({"error": f"No {phase} phase found in the analysis"}), 404
+        start_frame, end_frame = span["start_frame"], span["end_frame"]
+    
+    output_video_path = render_overlays(video_path, landmarks, results["frame_table"], start_frame, end_frame)
+    if output_video_path is None:
+        return jsonify({"error": "No analysed frames in the requested range"}), 404
+    return jsonify({
+        "output_video_path": output_video_path,
+        "url": f"http://localhost:5001/video/{output_video_path}",
+        "size": os.path.getsize(output_video_path),
+        "start_frame": start_frame,
+        "end_frame": end_frame
+    })
+
+@app.route('/keyframes', methods=['GET'])
+def get_keyframes():
+    """Swing phases and keyframe metrics of a stored analysis, or one keyframe as a JPEG.
+    
+    With image=<keyframe name or frame number>, that frame is decoded by seeking
+    straight to it and returned with its overlay drawn.
+    """
+    video_path = request.args.get('video_path', '')
+    if not video_path or not os.path.exists(video_path):
+        return jsonify({"error": f"Video file not found at {video_path}"}), 400
+    cached = result_cache.load(result_cache.cache_key(hash_file(video_path)))
+    if cached is None:
+        return jsonify({"error": f"No analysis found for {video_path}; analyse it first"}), 404
+    results, landmarks = cached
+    swing_index = results.get("swing_index")
+    
+    image = request.args.get('image')
+    if image is None:
+        return jsonify({"swing_index": swing_index, "keyframes": keyframe_metrics(results)})
+    if image.isdigit():
+        frame = int(image)
+    elif swing_index and image in swing_index["keyframes"]:
+        frame = swing_index["keyframes"][image]
+    else:
+        return jsonify({"error": f"Unknown keyframe: {image}"}), 404
+    
+    annotated = render_keyframe(video_path, landmarks, results["frame_table"], frame)
+    if annotated is None:
+        return jsonify({"error": f"Could not read frame {frame}"}), 500
+    ok, encoded = cv2.imencode('.jpg', annotated)
+    if not ok:
+        return jsonify({"error": "Could not encode keyframe image"}), 500
+    return Response(encoded.tobytes(), mimetype='image/jpeg')
+
+def _load_analysis(video_path):
+    """Cached (results, landmarks) for a clip, or an error response tuple."""
+    if not video_path or not os.path.exists(video_path):
+        return None, (jsonify({"error": f"Video file not found at {video_path}"}), 400)
+    cached = result_cache.load(result_cache.cache_key(hash_file(video_path)))
+    if cached is None:
+        return None, (jsonify({"error": f"No analysis found for {video_path}; analyse it first"}), 404)
+    return cached, None
+
+@app.route('/templates', methods=['GET'])
+def list_templates():
+    """List the reference stroke templates."""
+    library = get_template_library()
+    return jsonify({"templates": library.meta, "count": len(library)})
+
+@app.route('/templates', methods=['POST'])
+def create_template():
+    """Save an analysed clip's swing as a reference stroke template."""
+    data = request.get_json(silent=True) or {}
+    cached, error = _load_analysis(data.get('video_path', ''))
+    if error:
+        return error
+    if not data.get('name') or not data.get('stroke'):
+        return jsonify({"error": "name and stroke are required"}), 400
+    try:
+        meta = save_template(data['name'], cached[0], data['stroke'], data.get('description', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(meta), 201
+
+@app.route('/compare', methods=['POST'])
+def compare_stroke():
+    """Compare an analysed clip's swing with the reference templates, optionally of one stroke type."""
+    data = request.get_json(silent=True) or {}
+    cached, error = _load_analysis(data.get('video_path', ''))
+    if error:
+        return error
+    try:
+        top_k = max(1, int(data.get('top_k', COMPARE_TOP_K)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+    
+    comparison = compare_to_templates(cached[0], top_k=top_k, stroke=data.get('stroke'))
+    if comparison is None:
+        return jsonify({"error": "Not enough frames with a detected pose to compare"}), 422
+    return jsonify(comparison)
+
+@app.route('/players/<player_id>/trends', methods=['GET'])
+def player_trends(player_id):
+    """How a player's metrics have moved across recorded sessions.
+    
+    Query parameters: metric (repeatable; default every per-joint risk),
+    phase (per-phase metrics instead of whole sessions), since/until (ISO
+    dates) and bucket (day, week or month means).
+    """
+    metrics = request.args.getlist('metric') or [name for name in SESSION_METRICS if "_risk_" in name]
+    try:
+        trends = get_history_store().trends(
+            player_id, metrics,
+            phase=request.args.get('phase'),
+            since=_timestamp(request.args.get('since')),
+            until=_timestamp(request.args.get('until')),
+            bucket=request.args.get('bucket')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(trends)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a video analysis and return its job id immediately."""
+    data = request.get_json(silent=True) or {}
+    video_path = data.get('video_path', '')
+    if not video_path or not os.path.exists(video_path):
+        return jsonify({"error": f"Video file not found at {video_path}"}), 400
+    
+    try:
+        job = get_job_runner().submit(video_path)
+    except QueueFull as e:
+        logger.error(str(e))
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+    
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result"
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report a job's status and progress."""
+    job = get_job_runner().queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "frames_processed": job["frames_processed"],
+        "frames_planned": job["frames_planned"],
+        "error": job["error"],
+        "created": job["created"],
+        "updated": job["updated"]
+    })
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Fetch a finished job's analysis results."""
+    job = get_job_runner().queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    if job["status"] == "failed":
+        return jsonify({"job_id": job_id, "status": "failed", "error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"job_id": job_id, "status": job["status"], "stage": job["stage"]}), 202
+    
+    compact = request.args.get('format') == 'compact'
+    return jsonify({
+        "job_id": job_id,
+        "status": "done",
+        "summary": job["summary"],
+        "analysis_results": job["results"] if compact else serialize_results(deserialize_results(job["results"]))
+    })
+
 @app.route('/video/<path:filename>')
 def serve_video(filename):
     """Serve video files with proper CORS headers."""
@@ -211,7 +617,9 @@ def serve_video(filename):
             logger.error(f"Video file not found: {file_path}")
             return jsonify({"error": f"Video not found: {file_path}"}), 404
         
-        response = send_file(file_path, mimetype='video/mp4')
+        # Codec fallbacks can produce .avi; label the file by what it actually is.
+        mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        response = send_media(file_path, mimetype)
         response.headers['Access-Control-Allow-Origin'] = '*'
         response.headers['Access-Control-Allow-Methods'] = 'GET'
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
@@ -231,7 +639,7 @@ def serve_image(filename):
             filename = os.path.join(os.getcwd(), filename)
         
         if os.path.exists(filename):
-            return send_file(filename, mimetype='image/png')
+            return send_media(filename, 'image/png')
         else:
             logger.error(f"Image file not found: {filename}")
             return jsonify({"error": f"Image not found: {filename}"}), 404
@@ -265,20 +673,31 @@ def list_outputs():
 
 @app.route('/debug/analysis')
 def debug_analysis():
-    """Debug endpoint to check analysis cache."""
-    from tools import analysis_cache
+    """Debug endpoint to check a session's last analysis."""
+    analysis_cache = get_session(request.args.get('session_id', '')).analysis_results
+    compact = request.args.get('format') == 'compact'
     return jsonify({
-        "analysis_cache": analysis_cache,
+        "analysis_cache": serialize_results(analysis_cache, compact),
         "cache_keys": list(analysis_cache.keys()) if analysis_cache else [],
         "video_path_exists": os.path.exists(analysis_cache.get("output_video_path", "")) if analysis_cache.get("output_video_path") else False,
         "outputs_dir_contents": os.listdir("static/outputs") if os.path.exists("static/outputs") else []
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage timings, queue depths and memory in the Prometheus text format."""
+    extra_gauges = {"bharatshot_job_queue_depth": get_job_runner().queue.depth()}
+    return Response(render_metrics(extra_gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; 503 until the warm-up has finished."""
+    warmup = warm_up_status()
+    if warmup["state"] != "ready":
+        return jsonify({"status": warmup["state"], "warmup": warmup}), 503
     return jsonify({
         "status": "healthy",
+        "warmup": warmup,
         "message": "Cricket Biomechanics Agent is running",
         "tools_available": [
             "video_pose_estimation_tool",
@@ -309,4 +728,7 @@ if __name__ == '__main__':
     os.makedirs("static/outputs", exist_ok=True)
     
     logger.info("🚀 Cricket Biomechanics Agent starting...")
+    # With the debug reloader only the serving child (WERKZEUG_RUN_MAIN) warms up, not the watcher.
+    if WARMUP_ON_START and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warm_up()
     app.run(debug=True, port=5001, host='0.0.0.0')
\ No newline at end of file
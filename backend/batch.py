@@ -0,0 +1,174 @@
+"""Analyse whole directories of clips without going through /chat.
+
+Usage: python batch.py SESSIONS_DIR "more/**/*.mp4" -o batch_out [--workers 4] [--format parquet] [--analysis-only]
+Run from the backend directory. Each clip is analysed in a worker process
+(reusing the analysis cache), its compact results are written to
+OUTPUT/clips/<name>.<hash>.json, and OUTPUT/clips.csv and OUTPUT/players.csv
+(or .parquet) aggregate risk per clip and per player. The player is the clip's
+parent directory name unless --player-regex captures a (?P<player>...) group.
+--analysis-only skips drawing and encoding annotated videos, and --history
+records every clip in the player's session history, dated by file mtime.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from config import BATCH_WORKERS, logger
+from biomechanics import JOINTS, RISK_LEVELS
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".m4v")
+
+
+def find_clips(inputs):
+    """Expand directories (recursively) and glob patterns into a sorted list of video files."""
+    clips = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                clips.update(os.path.join(root, name) for name in names if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            clips.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(clips)
+
+
+def player_for(video_path, player_regex=None):
+    if player_regex:
+        match = re.search(player_regex, video_path)
+        if match:
+            return match.group("player")
+    return os.path.basename(os.path.dirname(os.path.abspath(video_path)))
+
+
+def analyse_clip(video_path, output_dir, render=True, player=None):
+    """Worker entry point: analyse one clip, write its results file and return a summary row.
+
+    With a `player`, the session is also recorded in the history store.
+    """
+    from tools import analyze_video
+    from frame_table import serialize_results
+    import result_cache
+
+    stages = set()
+    started = time.perf_counter()
+    summary, results = analyze_video(video_path, progress=lambda stage, *_: stages.add(stage), render=render)
+    row = {"clip": video_path, "elapsed": round(time.perf_counter() - started, 3)}
+    if results is None:
+        row["error"] = summary.strip()
+        return row
+
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    results_path = os.path.join(output_dir, "clips", f"{name}.{result_cache.hash_file(video_path)[:12]}.json")
+    with open(results_path, "w") as f:
+        json.dump({"clip": video_path, "summary": summary, "analysis_results": serialize_results(results, compact=True)}, f)
+
+    if player is not None:
+        from history import get_history_store
+        get_history_store().record(player, results, result_cache.hash_file(video_path), video_path, os.path.getmtime(video_path))
+
+    swing = (results.get("kinematics") or {}).get("swing") or {}
+    row.update({
+        "results": results_path,
+        # A cache hit replays frames without running the sampling stage.
+        "cached": "sampling" not in stages,
+        "frames": results["total_frames"],
+        "frame_rate": results["frame_rate"],
+        "peak_swing_speed": swing.get("peak_speed"),
+        **{f"{joint}_risk": results["max_injury_risk"][joint] for joint in JOINTS},
+    })
+    return row
+
+
+def player_rows(clip_rows):
+    """Per player: clip count, worst risk and share of clips at High per joint, mean peak swing speed."""
+    by_player = defaultdict(list)
+    for row in clip_rows:
+        if "error" not in row:
+            by_player[row["player"]].append(row)
+    players = []
+    for player, rows in sorted(by_player.items()):
+        speeds = [r["peak_swing_speed"] for r in rows if r["peak_swing_speed"] is not None]
+        summary = {"player": player, "clips": len(rows), "frames": sum(r["frames"] for r in rows)}
+        for joint in JOINTS:
+            levels = [RISK_LEVELS.index(r[f"{joint}_risk"]) for r in rows]
+            summary[f"{joint}_worst_risk"] = RISK_LEVELS[max(levels)]
+            summary[f"{joint}_high_share"] = round(levels.count(len(RISK_LEVELS) - 1) / len(levels), 3)
+        summary["mean_peak_swing_speed"] = round(sum(speeds) / len(speeds), 2) if speeds else None
+        players.append(summary)
+    return players
+
+
+def write_table(rows, path, table_format):
+    """Write rows as CSV, or Parquet (requires pyarrow)."""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    if table_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table({c: [row.get(c) for row in rows] for c in columns}), path)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="clip directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="batch_out")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--analysis-only", action="store_true", help="skip rendering annotated videos")
+    parser.add_argument("--history", action="store_true", help="record each clip in the player session history")
+    parser.add_argument("--player-regex", help="regex with a (?P<player>...) group, matched against the clip path")
+    args = parser.parse_args()
+
+    clips = find_clips(args.inputs)
+    if not clips:
+        parser.error("no video files found")
+    os.makedirs(os.path.join(args.output_dir, "clips"), exist_ok=True)
+
+    rows = []
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        futures = {pool.submit(analyse_clip, clip, args.output_dir, not args.analysis_only,
+                               player_for(clip, args.player_regex) if args.history else None): clip for clip in clips}
+        for done, future in enumerate(as_completed(futures), 1):
+            clip = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                logger.error(f"Batch analysis of {clip} failed: {e}")
+                row = {"clip": clip, "error": str(e)}
+            row["player"] = player_for(clip, args.player_regex)
+            rows.append(row)
+            status = row.get("error") or ("cached" if row["cached"] else f"{row['elapsed']:.1f}s")
+            print(f"[{done}/{len(clips)}] {clip}: {status}")
+    elapsed = time.perf_counter() - started
+
+    rows.sort(key=lambda row: row["clip"])
+    write_table(rows, os.path.join(args.output_dir, f"clips.{args.format}"), args.format)
+    write_table(player_rows(rows), os.path.join(args.output_dir, f"players.{args.format}"), args.format)
+
+    analysed = [row for row in rows if "error" not in row]
+    # Cached clips replay stored results, so only freshly analysed frames count towards throughput.
+    frames = sum(row["frames"] for row in analysed if not row["cached"])
+    print(json.dumps({
+        "clips": len(clips),
+        "failed": len(clips) - len(analysed),
+        "cached": sum(row["cached"] for row in analysed),
+        "cached_frames": sum(row["frames"] for row in analysed if row["cached"]),
+        "seconds": round(elapsed, 2),
+        "clips_per_minute": round(len(clips) / elapsed * 60, 2),
+        "frames_per_second": round(frames / elapsed, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Scalar assess_injury_risk vs the vectorised biomechanics engine.
+
+Usage: python benchmarks/bench_biomechanics.py [--frames 100 1000 10000]
+Run from the backend directory. Synthetic landmark series (with missing-pose
+frames and uneven sampling gaps) are assessed both ways; the frame_data
+records must be identical, and the per-frame timings are reported.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+from config import PoseLandmark
+from tools import assess_injury_risk
+from biomechanics import landmarks_to_array, assess_landmarks, frame_records
+
+FRAME_RATE = 30.0
+FRAME_SIZE = (1920, 1080)
+
+
+def synthetic_series(frames, seed=0):
+    """Random landmark lists with ~10% missing poses, at uneven frame indices."""
+    rng = np.random.default_rng(seed)
+    frame_indices = np.cumsum(rng.integers(1, 4, size=frames))
+    series = []
+    for _ in range(frames):
+        if rng.random() < 0.1:
+            series.append(None)
+            continue
+        pose_landmarks = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, v in rng.random((33, 4)):
+            pose_landmarks.landmark.add(x=x, y=y, z=z, visibility=v)
+        series.append(pose_landmarks)
+    return [int(i) for i in frame_indices], series
+
+
+def scalar_records(frame_indices, series):
+    """frame_data as the per-frame scalar code builds it."""
+    records = []
+    bat_positions = []
+    wrist_frames = []
+    for frame_index, pose_landmarks in zip(frame_indices, series):
+        if pose_landmarks is None:
+            records.append({
+                "frame": frame_index,
+                "injury_risk": {"back": "Low", "knees": "Low", "shoulders": "Low"},
+                "analysis": {"frame": frame_index, "status": "No pose detected"}
+            })
+            continue
+        landmarks = pose_landmarks.landmark
+        frame_gap = wrist_frames[-1] - wrist_frames[-2] if len(wrist_frames) >= 2 else 1
+        injury_risk, analysis = assess_injury_risk(landmarks, FRAME_RATE / frame_gap, bat_positions)
+        right_wrist = landmarks[PoseLandmark.RIGHT_WRIST]
+        bat_positions.append([right_wrist.x * FRAME_SIZE[0], right_wrist.y * FRAME_SIZE[1]])
+        wrist_frames.append(frame_index)
+        records.append({"frame": frame_index, "injury_risk": injury_risk, "analysis": analysis})
+    return records
+
+
+def vector_records(frame_indices, series):
+    landmarks = np.stack([landmarks_to_array(pose_landmarks) for pose_landmarks in series])
+    return frame_records(assess_landmarks(landmarks, frame_indices, FRAME_RATE, FRAME_SIZE), frame_indices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    rows = []
+    for frames in args.frames:
+        frame_indices, series = synthetic_series(frames)
+        landmarks = np.stack([landmarks_to_array(pose_landmarks) for pose_landmarks in series])
+
+        start = time.perf_counter()
+        expected = scalar_records(frame_indices, series)
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assessment = assess_landmarks(landmarks, frame_indices, FRAME_RATE, FRAME_SIZE)
+        engine_time = time.perf_counter() - start
+        actual = frame_records(assessment, frame_indices)
+        records_time = time.perf_counter() - start
+
+        identical = actual == expected
+        rows.append({
+            "frames": frames,
+            "scalar_us_per_frame": round(scalar_time / frames * 1e6, 2),
+            "engine_us_per_frame": round(engine_time / frames * 1e6, 2),
+            "engine_with_records_us_per_frame": round(records_time / frames * 1e6, 2),
+            "identical": identical
+        })
+        print(f"{frames:>7} frames  scalar {scalar_time * 1e3:9.2f} ms  engine {engine_time * 1e3:8.2f} ms  "
+              f"(+records {records_time * 1e3:8.2f} ms)  {'identical' if identical else 'DIFFERS'}")
+
+    print(json.dumps(rows, indent=2))
+    if not all(row["identical"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
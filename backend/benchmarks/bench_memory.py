@@ -0,0 +1,70 @@
+"""Peak RSS of video_pose_estimation_tool against clip length.
+
+Usage: python benchmarks/bench_memory.py [--width 1920 --height 1080 --lengths 25 50 100]
+Run from the backend directory. Each clip is analysed in a fresh subprocess so
+peak RSS is not polluted by earlier runs.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def write_clip(path, frames, width, height, fps=30):
+    """Write a synthetic clip with a moving disc so every frame differs."""
+    import cv2
+    import numpy as np
+
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(frames):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        cv2.circle(frame, ((i * 7) % width, height // 2), height // 10, (255, 255, 255), -1)
+        out.write(frame)
+    out.release()
+
+
+def run_child(video_path):
+    """Analyse one clip and print its peak RSS as JSON."""
+    from tools import analyze_video
+
+    _, results = analyze_video(video_path)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"peak_rss_mb": round(peak_kb / 1024, 1), "ok": results is not None}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for length in args.lengths:
+            clip = os.path.join(tmp, f"clip_{length}.mp4")
+            write_clip(clip, length, args.width, args.height)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", clip],
+                capture_output=True, text=True, cwd=BACKEND_DIR
+            )
+            stats = json.loads(proc.stdout.strip().splitlines()[-1])
+            rows.append({"frames": length, "width": args.width, "height": args.height, **stats})
+            print(f"{length:>6} frames  {args.width}x{args.height}  peak RSS {stats['peak_rss_mb']:>8.1f} MB")
+
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
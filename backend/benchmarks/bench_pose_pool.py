@@ -0,0 +1,157 @@
+"""Serial vs process-pool pose inference: wall time and result equivalence.
+
+Usage: python benchmarks/bench_pose_pool.py [--video clip.mp4] [--workers 2 4 8] [--chunk-size 64] [--tolerance 0.05]
+Run from the backend directory. Without --video a synthetic clip from
+benchmarks/synthetic.py is rendered and used. Every frame of the clip is analysed. The
+pooled results are compared against the serial path frame by frame: detection
+must agree and landmark coordinates must match within --tolerance (chunk
+boundaries re-seed tracking, so tiny numeric drift is expected). On the
+synthetic clip tracking stays history-dependent well past any overlap, so
+there the pooled landmarks must instead be as close to the known ground truth
+as the serial ones (median error within --truth-tolerance of serial's). The
+comparison only means something when poses are detected, so a clip with no
+detections fails the run. split_chunks and the merge are also checked
+directly: every frame comes back once, in order, with overlap frames dropped.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+from config import new_pose, POSE_CHUNK_OVERLAP
+from pipeline import read_frames, estimate_poses
+from pose_pool import infer_poses_parallel, split_chunks, warm_pose_pool
+import synthetic
+
+
+def _as_array(pose_landmarks):
+    if not pose_landmarks:
+        return None
+    return np.array([[lm.x, lm.y, lm.z] for lm in pose_landmarks.landmark], dtype=np.float32)
+
+
+def run_serial(video_path):
+    pose = new_pose()
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return {i: _as_array(r.pose_landmarks) for i, _, r in estimate_poses(read_frames(cap), pose)}
+    finally:
+        cap.release()
+        pose.close()
+
+
+def ground_truth_error(results, truth):
+    """Median x/y distance from the ground-truth landmarks, over the joints the figure draws."""
+    joints = [i for i in range(truth.shape[1]) if i not in synthetic.ATTACHED]
+    errors = [np.abs(results[i][joints, :2] - truth[i, joints, :2]).max(axis=1)
+              for i in sorted(results) if results[i] is not None]
+    return float(np.median(np.concatenate(errors)))
+
+
+def compare(serial, pooled, tolerance):
+    """Return (detection mismatches, max landmark deviation)."""
+    mismatches = 0
+    max_dev = 0.0
+    for frame_index, expected in serial.items():
+        actual = _as_array(pooled[frame_index].pose_landmarks) if frame_index in pooled else None
+        if (expected is None) != (actual is None):
+            mismatches += 1
+        elif expected is not None:
+            max_dev = max(max_dev, float(np.abs(expected - actual).max()))
+    return mismatches, max_dev
+
+
+def check_chunking(frame_indices, chunk_size, overlap):
+    """True if merging the chunks, minus each one's leading overlap, gives back frame_indices."""
+    merged = []
+    for indices, lead in split_chunks(frame_indices, chunk_size, overlap):
+        if indices[:lead] != merged[len(merged) - lead:]:
+            return False
+        merged.extend(indices[lead:])
+    return merged == list(frame_indices)
+
+
+def chunking_ok(args):
+    cases = [(list(range(n)), size, overlap) for n in (1, 7, 64, 65, 240) for size in (1, 8, 64) for overlap in (0, 4, 8)]
+    cases.append((list(range(0, 600, 3)), args.chunk_size, args.overlap))
+    return all(check_chunking(*case) for case in cases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="clip to analyse (default: a synthetic 1280x720 clip)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--overlap", type=int, default=POSE_CHUNK_OVERLAP)
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--truth-tolerance", type=float, default=0.005)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        truth = None
+        if args.video is None:
+            args.video = os.path.join(tmp, "synthetic.mp4")
+            truth = synthetic.write_clip(args.video, 240, 30, 1280, 720)
+        rows = run(args, truth)
+
+    print(json.dumps(rows, indent=2))
+    if not all(row.get("equivalent", True) for row in rows) or not rows[0]["frames_detected"]:
+        sys.exit(1)
+
+
+def run(args, truth=None):
+    start = time.perf_counter()
+    serial = run_serial(args.video)
+    serial_time = time.perf_counter() - start
+    detected = sum(landmarks is not None for landmarks in serial.values())
+    chunks_ok = chunking_ok(args)
+    rows = [{"mode": "serial", "workers": 1, "seconds": round(serial_time, 3), "frames": len(serial),
+             "frames_detected": detected, "chunking_ok": chunks_ok}]
+    print(f"serial      {len(serial)} frames  {serial_time:.2f}s  {detected} detected  "
+          f"chunking {'OK' if chunks_ok else 'BROKEN'}")
+    if not detected:
+        print("No pose detected in any frame: the equivalence check would compare nothing", file=sys.stderr)
+        rows[0]["equivalent"] = False
+        return rows
+    serial_error = None
+    if truth is not None:
+        serial_error = ground_truth_error(serial, truth)
+        rows[0]["ground_truth_error"] = round(serial_error, 5)
+
+    for workers in args.workers:
+        warm_pose_pool(workers)
+        start = time.perf_counter()
+        pooled = infer_poses_parallel(args.video, list(serial), workers, args.chunk_size, args.overlap)
+        elapsed = time.perf_counter() - start
+        mismatches, max_dev = compare(serial, pooled, args.tolerance)
+        in_order = list(pooled) == list(serial)
+        row = {
+            "mode": "pool", "workers": workers, "seconds": round(elapsed, 3), "frames": len(pooled),
+            "speedup": round(serial_time / elapsed, 2), "detection_mismatches": mismatches,
+            "max_landmark_deviation": round(max_dev, 5), "in_order": in_order
+        }
+        if truth is None:
+            close = max_dev <= args.tolerance
+            accuracy = f"max dev {max_dev:.4f}"
+        else:
+            error = ground_truth_error({i: _as_array(r.pose_landmarks) for i, r in pooled.items()}, truth)
+            row["ground_truth_error"] = round(error, 5)
+            close = error <= serial_error + args.truth_tolerance
+            accuracy = f"max dev {max_dev:.4f}  truth error {error:.4f} (serial {serial_error:.4f})"
+        row["equivalent"] = equivalent = chunks_ok and in_order and mismatches == 0 and close
+        rows.append(row)
+        print(f"pool x{workers:<3}  {len(pooled)} frames  {elapsed:.2f}s  speedup {serial_time / elapsed:.2f}x  "
+              f"mismatches {mismatches}  {accuracy}  {'OK' if equivalent else 'DIFFERS'}")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""Reproducible benchmark suite on synthetic batting clips.
+
+Usage: python benchmarks/bench_suite.py [--quick] [--video clip.mp4] [--output results.json] [--sections angles risk encode compare end_to_end chat cold_start]
+Run from the backend directory. Clips come from benchmarks/synthetic.py, so
+every run sees identical input; --video runs end_to_end and chat on a real
+clip instead. Sections:
+- angles: calculate_angle vs batch_angles per call, checked against the
+  ground-truth figure.
+- risk: assess_injury_risk vs assess_landmarks per frame.
+- encode: StreamingVideoWriter frames/sec per resolution.
+- compare: matching one swing against a library of templates with LB_Keogh
+  pruning, vs exact DTW against every template.
+- end_to_end: analyze_video frames/sec, peak RSS and per-stage time per clip.
+  Each row records frames_detected; a clip in which MediaPipe finds no pose
+  only times the empty path, so such rows are marked not ok and the suite
+  exits non-zero.
+- chat: /chat latency with the LLM stubbed, for the analysis fast path
+  (cold, then cached) and the tool-selection path.
+- cold_start: time to import config and app, and until the warm-up marks the
+  process ready, against COLD_START_BUDGET_SECONDS.
+end_to_end, chat and cold_start run each case in a fresh subprocess, in a scratch working
+directory so the analysis cache starts empty. Results are written as JSON
+with the commit they were measured at, for comparison across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import synthetic
+
+# (width, height, fps, frames)
+CLIPS = [(640, 360, 30, 90), (1280, 720, 30, 90), (1920, 1080, 30, 90), (1280, 720, 60, 240)]
+QUICK_CLIPS = CLIPS[:2]
+ENCODE_SIZES = [(640, 360), (1280, 720), (1920, 1080)]
+SECTIONS = ("angles", "risk", "encode", "compare", "end_to_end", "chat", "cold_start")
+
+
+def _per_call_us(fn, calls):
+    start = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - start) / calls * 1e6, 3)
+
+
+def bench_angles(frames=2000, fps=30):
+    from tools import calculate_angle
+    from biomechanics import batch_angles
+
+    series = synthetic.pose_series(frames, fps)
+    triples = [(synthetic.L_HIP, synthetic.L_KNEE, synthetic.L_ANKLE), (synthetic.L_HIP, synthetic.L_SHOULDER, synthetic.L_ELBOW)]
+    points = series[..., :2].astype(np.float64)
+    point_lists = points.tolist()
+
+    scalar = []
+    scalar_us = _per_call_us(
+        lambda: scalar.extend(calculate_angle(xy[a], xy[b], xy[c]) for xy in point_lists for a, b, c in triples),
+        frames * len(triples)
+    )
+    vector = []
+    vector_us = _per_call_us(
+        lambda: vector.extend(batch_angles(points[:, a], points[:, b], points[:, c]) for a, b, c in triples),
+        frames * len(triples)
+    )
+    # The figure is drawn with a known knee bend, so the knee series has an exact answer.
+    expected_knee = np.array([180 - synthetic.pose_parameters(i / fps, frames / fps)["knee_bend"] for i in range(frames)])
+    return {
+        "calls": frames * len(triples),
+        "calculate_angle_us": scalar_us,
+        "batch_angles_us": vector_us,
+        "scalar_vs_batch_max_deviation_deg": float(np.abs(np.array(scalar).reshape(frames, -1).T - np.array(vector)).max()),
+        "knee_ground_truth_max_error_deg": float(np.abs(vector[0] - expected_knee).max()),
+    }
+
+
+def bench_risk(frames=2000):
+    from bench_biomechanics import scalar_records, FRAME_RATE, FRAME_SIZE
+    from mediapipe.framework.formats import landmark_pb2
+    from biomechanics import assess_landmarks, frame_records
+
+    series = synthetic.pose_series(frames, FRAME_RATE)
+    frame_indices = list(range(frames))
+    landmark_lists = []
+    for landmarks in series:
+        pose = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, v in landmarks:
+            pose.landmark.add(x=x, y=y, z=z, visibility=v)
+        landmark_lists.append(pose)
+
+    expected = []
+    scalar_us = _per_call_us(lambda: expected.extend(scalar_records(frame_indices, landmark_lists)), frames)
+    actual = []
+    engine_us = _per_call_us(
+        lambda: actual.extend(frame_records(assess_landmarks(series, frame_indices, FRAME_RATE, FRAME_SIZE), frame_indices)),
+        frames
+    )
+    return {"frames": frames, "assess_injury_risk_us_per_frame": scalar_us,
+            "assess_landmarks_us_per_frame": engine_us, "identical": actual == expected}
+
+
+def bench_encode(frames=120):
+    from pipeline import StreamingVideoWriter, probe_video_codec
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in ENCODE_SIZES:
+            images = [synthetic.render_frame(lms, width, height) for lms in synthetic.pose_series(frames, 30)]
+            writer = StreamingVideoWriter(os.path.join(tmp, f"encode_{width}x{height}.mp4"), 30)
+            start = time.perf_counter()
+            for image in images:
+                writer.write(image)
+            writer.close()
+            elapsed = time.perf_counter() - start
+            rows.append({"width": width, "height": height, "frames": frames, "codec": probe_video_codec()[0],
+                         "frames_per_second": round(frames / elapsed, 1)})
+    return rows
+
+
+def _synthetic_results(frames, fps, width=1280, height=720, jitter=None):
+    """Analysis results for a synthetic swing, computed straight from its ground-truth landmarks."""
+    from biomechanics import assess_landmarks
+    from frame_table import FrameTable
+    from kinematics import compute_kinematics, segment_phases
+
+    series = synthetic.pose_series(frames, fps)
+    if jitter is not None:
+        series[..., :2] += jitter.normal(0, 0.004, size=series[..., :2].shape).astype(np.float32)
+    frame_indices = list(range(frames))
+    assessment = assess_landmarks(series, frame_indices, fps, (width, height))
+    kinematics = compute_kinematics(series, frame_indices, fps, (width, height))
+    return {"frame_table": FrameTable.from_assessment(assessment, frame_indices), "frame_rate": fps,
+            "swing_index": segment_phases(kinematics)}
+
+
+def bench_compare(templates=500, repeats=5):
+    import strokes
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        strokes.TEMPLATE_DIR = tmp
+        base = strokes.swing_angles(_synthetic_results(90, 30))
+        for i in range(templates):
+            # Each template is the reference swing time-warped, offset and perturbed.
+            warp = np.clip(np.linspace(0, 1, len(base)) ** rng.uniform(0.7, 1.4), 0, 1) * (len(base) - 1)
+            series = np.column_stack([np.interp(warp, np.arange(len(base)), base[:, c]) for c in range(base.shape[1])])
+            series += rng.normal(0, rng.uniform(1, 20), size=base.shape[1]) + rng.normal(0, 1, size=series.shape)
+            np.savez(os.path.join(tmp, f"t{i:04d}.npz"), series=series.astype(np.float32),
+                     meta=np.array(json.dumps({"name": f"t{i:04d}", "stroke": "cover_drive"})))
+        load_start = time.perf_counter()
+        library = strokes.TemplateLibrary(tmp)
+        load_ms = (time.perf_counter() - load_start) * 1000
+
+        results = _synthetic_results(120, 40, jitter=rng)
+        query = strokes.swing_angles(results)
+        pruned, exhaustive = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            matches, compared = library.match(query)
+            pruned.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            distances = strokes.dtw_distances(query, library.series, library.radius)
+            exhaustive.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        strokes.compare_to_templates(results)
+        compare_ms = (time.perf_counter() - start) * 1000
+    return {
+        "templates": templates,
+        "load_ms": round(load_ms, 2),
+        "match_ms": round(statistics.median(pruned), 2),
+        "exact_dtw_compared": compared,
+        "exhaustive_dtw_ms": round(statistics.median(exhaustive), 2),
+        "compare_with_deviations_ms": round(compare_ms, 2),
+        "same_best_match": matches[0][0] == int(np.argmin(distances)),
+    }
+
+
+def child_end_to_end(clip):
+    from tools import analyze_video
+    from metrics import trace_request
+
+    with trace_request() as trace:
+        start = time.perf_counter()
+        _, results = analyze_video(clip)
+        elapsed = time.perf_counter() - start
+    frames = results["total_frames"] if results else 0
+    detected = int(results["frame_table"].detected.sum()) if results else 0
+    return {
+        "ok": results is not None and detected > 0,
+        "frames_analysed": frames,
+        "frames_detected": detected,
+        "seconds": round(elapsed, 3),
+        "frames_per_second": round(frames / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages_ms": {stage: s["total_ms"] for stage, s in trace.to_dict()["stages"].items()},
+    }
+
+
+class StubLLM:
+    """Stands in for the hosted model: instant fixed reply, never calls tools."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+        return AIMessage(content="Stub narration of the analysis.")
+
+
+def child_chat(clip, repeats=5):
+    import config
+    config.llm = StubLLM()
+    from app import app
+
+    client = app.test_client()
+
+    def latency_ms(message, video_path):
+        start = time.perf_counter()
+        response = client.post("/chat", json={"message": message, "video_path": video_path})
+        assert response.status_code == 200, response.data
+        return (time.perf_counter() - start) * 1000
+
+    def summary(samples):
+        samples = sorted(samples)
+        return {"p50_ms": round(statistics.median(samples), 2),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                "runs": len(samples)}
+
+    cold = latency_ms("Analyze my batting technique", clip)
+    cached = [latency_ms("Analyze my batting technique", clip) for _ in range(repeats)]
+    tool_path = [latency_ms("Hello, what can you do?", "") for _ in range(repeats)]
+    # Served from the cache the cold request filled.
+    from tools import analyze_video
+    _, results = analyze_video(clip)
+    detected = int(results["frame_table"].detected.sum()) if results else 0
+    return {"ok": detected > 0, "frames_detected": detected, "analysis_cold_ms": round(cold, 2),
+            "analysis_cached": summary(cached), "tool_selection": summary(tool_path)}
+
+
+def child_cold_start(clip):
+    start = time.perf_counter()
+    import config
+    config_s = time.perf_counter() - start
+    config.llm = StubLLM()
+    from app import app
+    import_s = time.perf_counter() - start
+    from warmup import warm_up_status
+
+    # Poll /health like a load balancer would; the first request starts the warm-up.
+    client = app.test_client()
+    while client.get("/health").status_code != 200 and warm_up_status()["state"] != "failed":
+        time.sleep(0.01)
+    ready_s = time.perf_counter() - start
+    status = warm_up_status()
+    return {
+        "ok": status["state"] == "ready",
+        "import_config_s": round(config_s, 3),
+        "import_app_s": round(import_s, 3),
+        "ready_s": round(ready_s, 3),
+        "warmup_stages_ms": status["stages_ms"],
+        "budget_s": config.COLD_START_BUDGET_SECONDS,
+        "within_budget": status["state"] == "ready" and ready_s <= config.COLD_START_BUDGET_SECONDS,
+    }
+
+
+CHILDREN = {"end_to_end": child_end_to_end, "chat": child_chat, "cold_start": child_cold_start}
+
+
+def _run_child(kind, clip, workdir):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", kind, clip],
+        capture_output=True, text=True, cwd=workdir
+    )
+    if proc.returncode != 0:
+        return {"ok": False, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _warn_undetected(name, row):
+    if row.get("frames_detected") == 0:
+        print(f"WARNING: {name}: MediaPipe detected no pose in any frame; these timings only "
+              f"cover the empty path", file=sys.stderr)
+
+
+def _clip_info(path):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        return {"video": path, "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "fps": round(cap.get(cv2.CAP_PROP_FPS), 2), "frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT))}
+    finally:
+        cap.release()
+
+
+def _clips(specs, tmp, video=None):
+    """(path, description) per clip: the given video, or synthetic clips rendered into tmp."""
+    if video:
+        return [(video, _clip_info(video))]
+    clips = []
+    for width, height, fps, frames in specs:
+        clip = os.path.join(tmp, f"clip_{width}x{height}_{fps}fps_{frames}.mp4")
+        synthetic.write_clip(clip, frames, fps, width, height)
+        clips.append((clip, {"width": width, "height": height, "fps": fps, "frames": frames}))
+    return clips
+
+
+def bench_end_to_end(clips, tmp, video=None):
+    rows = []
+    for clip, info in _clips(clips, tmp, video):
+        workdir = tempfile.mkdtemp(dir=tmp)
+        row = {**info, **_run_child("end_to_end", clip, workdir)}
+        rows.append(row)
+        name = f"end_to_end {info['width']}x{info['height']}@{info['fps']} {info['frames']}f"
+        print(f"{name}: {row.get('frames_per_second')} fps, {row.get('frames_detected')} frames detected, "
+              f"peak RSS {row.get('peak_rss_mb')} MB", file=sys.stderr)
+        _warn_undetected(name, row)
+    return rows
+
+
+def bench_chat(tmp, video=None):
+    clip, info = _clips(CLIPS[:1], tmp, video)[0]
+    row = {"clip": info, **_run_child("chat", clip, tempfile.mkdtemp(dir=tmp))}
+    _warn_undetected("chat", row)
+    return row
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=BACKEND_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer, smaller clips")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--video", help="run end_to_end and chat on this clip instead of synthetic ones")
+    parser.add_argument("--output", help="write the JSON here as well as to stdout")
+    parser.add_argument("--child", nargs=2, metavar=("KIND", "CLIP"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, clip = args.child
+        print(json.dumps(CHILDREN[kind](clip)))
+        return
+
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": {},
+    }
+    results = report["results"]
+    with tempfile.TemporaryDirectory() as tmp:
+        if "angles" in args.sections:
+            results["angles"] = bench_angles()
+        if "risk" in args.sections:
+            results["risk"] = bench_risk()
+        if "encode" in args.sections:
+            results["encode"] = bench_encode()
+        if "compare" in args.sections:
+            results["compare"] = bench_compare(100 if args.quick else 500)
+        if "end_to_end" in args.sections:
+            results["end_to_end"] = bench_end_to_end(QUICK_CLIPS if args.quick else CLIPS, tmp, args.video)
+        if "chat" in args.sections:
+            results["chat"] = bench_chat(tmp, args.video)
+        if "cold_start" in args.sections:
+            results["cold_start"] = _run_child("cold_start", "-", tempfile.mkdtemp(dir=tmp))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    # Timings from clips with no detections measure the wrong path; fail the run.
+    rows = results.get("end_to_end", []) + ([results["chat"]] if "chat" in results else [])
+    if any(row.get("frames_detected") == 0 for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Deterministic synthetic batting clips: a figure with known joint angles.
+
+Every frame is a pure function of (frame index, fps, resolution), so every
+machine renders the same pixels (encoded bytes still depend on the OpenCV
+build). The batter leans,
+bends the knees and swings the right wrist through an arc that peaks at mid
+clip; `pose_series` returns the exact landmarks drawn, from which the ground
+truth angles follow.
+"""
+import math
+
+import cv2
+import numpy as np
+
+# MediaPipe landmark indices used to build the figure; every other landmark is
+# attached to the nearest body part below.
+NOSE, L_SHOULDER, R_SHOULDER, L_ELBOW, R_ELBOW, L_WRIST, R_WRIST = 0, 11, 12, 13, 14, 15, 16
+L_HIP, R_HIP, L_KNEE, R_KNEE, L_ANKLE, R_ANKLE = 23, 24, 25, 26, 27, 28
+ATTACHED = {
+    **{i: NOSE for i in range(1, 11)},
+    17: L_WRIST, 19: L_WRIST, 21: L_WRIST, 18: R_WRIST, 20: R_WRIST, 22: R_WRIST,
+    29: L_ANKLE, 31: L_ANKLE, 30: R_ANKLE, 32: R_ANKLE,
+}
+
+
+def _rotate(vector, degrees):
+    radians = math.radians(degrees)
+    c, s = math.cos(radians), math.sin(radians)
+    return np.array([c * vector[0] - s * vector[1], s * vector[0] + c * vector[1]])
+
+
+def swing_phase(t, duration):
+    """0 before the swing, 1 after it; steepest (peak wrist speed) at mid clip."""
+    return 0.5 * (1 + math.tanh((t - duration / 2) * 8 / max(duration, 1e-6)))
+
+
+def pose_parameters(t, duration):
+    """Joint parameters (degrees) at time t. The left knee's interior angle is 180 - knee_bend."""
+    phase = swing_phase(t, duration)
+    return {
+        "lean": 12 + 22 * phase + 4 * math.sin(2 * math.pi * t),
+        "knee_bend": 25 + 35 * phase,
+        "arm_raise": 40 + 60 * phase,
+        "swing_angle": -150 + 180 * phase,
+    }
+
+
+def pose_landmarks(t, duration):
+    """(33, 4) normalised landmarks at time t for a clip of `duration` seconds."""
+    params = pose_parameters(t, duration)
+    lean, knee_bend, arm_raise = params["lean"], params["knee_bend"], params["arm_raise"]
+
+    points = np.zeros((33, 2))
+    hip_mid = np.array([0.5, 0.58])
+    spine = _rotate(np.array([0.0, -0.22]), lean)
+    points[L_HIP], points[R_HIP] = hip_mid + (-0.04, 0), hip_mid + (0.04, 0)
+    shoulder_mid = hip_mid + spine
+    points[L_SHOULDER], points[R_SHOULDER] = shoulder_mid + (-0.06, 0), shoulder_mid + (0.06, 0)
+    points[NOSE] = shoulder_mid + spine * 0.35
+
+    for hip, knee, ankle, side in ((L_HIP, L_KNEE, L_ANKLE, -1), (R_HIP, R_KNEE, R_ANKLE, 1)):
+        thigh = _rotate(np.array([0.0, 0.16]), side * 10)
+        points[knee] = points[hip] + thigh
+        points[ankle] = points[knee] + _rotate(thigh, -side * knee_bend)
+
+    # Upper arm rotated away from the shoulder->hip line by arm_raise degrees.
+    torso = points[L_HIP] - points[L_SHOULDER]
+    upper_arm = torso / np.linalg.norm(torso) * 0.12
+    points[L_ELBOW] = points[L_SHOULDER] + _rotate(upper_arm, arm_raise)
+    points[L_WRIST] = points[L_ELBOW] + _rotate(upper_arm, arm_raise + 20)
+    # The right hand sweeps a half circle around the shoulders: the bat swing.
+    swing_angle = params["swing_angle"]
+    points[R_WRIST] = shoulder_mid + 0.2 * np.array([math.cos(math.radians(swing_angle)), math.sin(math.radians(swing_angle))])
+    points[R_ELBOW] = (points[R_SHOULDER] + points[R_WRIST]) / 2
+
+    for landmark, anchor in ATTACHED.items():
+        points[landmark] = points[anchor]
+    # Mirrored so the batter faces the camera (their left on the image right),
+    # matching the face drawn on the head; otherwise left and right are ambiguous.
+    points[:, 0] = 1 - points[:, 0]
+    return np.column_stack([points, np.zeros(33), np.ones(33)]).astype(np.float32)
+
+
+def pose_series(frames, fps):
+    """(frames, 33, 4) landmarks for every frame of a clip."""
+    duration = frames / fps
+    return np.stack([pose_landmarks(i / fps, duration) for i in range(frames)])
+
+
+def _limb(frame, a, b, width, colour):
+    cv2.line(frame, tuple(a), tuple(b), colour, width, cv2.LINE_AA)
+    for end in (a, b):
+        cv2.circle(frame, tuple(end), width // 2, colour, -1, cv2.LINE_AA)
+
+
+def render_frame(landmarks, width, height):
+    """Draw one frame: a clothed figure with a face on a plain background.
+
+    A bare stick figure is never detected by MediaPipe (its detector looks for
+    a head and torso), so limbs are drawn thick with a filled torso and a face;
+    the joints still sit exactly on the ground-truth landmarks.
+    """
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (200, 200, 200)
+    xy = np.round(landmarks[:, :2] * (width, height)).astype(int)
+    unit = height / 100
+    skin, shirt, trousers, dark = (120, 160, 210), (180, 60, 40), (40, 40, 40), (20, 20, 20)
+
+    cv2.fillConvexPoly(frame, xy[[L_SHOULDER, R_SHOULDER, R_HIP, L_HIP]], shirt, cv2.LINE_AA)
+    for hip, knee, ankle in ((L_HIP, L_KNEE, L_ANKLE), (R_HIP, R_KNEE, R_ANKLE)):
+        _limb(frame, xy[hip], xy[knee], int(5 * unit), trousers)
+        _limb(frame, xy[knee], xy[ankle], int(5 * unit), trousers)
+        cv2.ellipse(frame, tuple(xy[ankle] + (int(2 * unit), 0)), (int(3 * unit), int(1.5 * unit)), 0, 0, 360, dark, -1)
+    for shoulder, elbow, wrist in ((L_SHOULDER, L_ELBOW, L_WRIST), (R_SHOULDER, R_ELBOW, R_WRIST)):
+        _limb(frame, xy[shoulder], xy[elbow], int(4 * unit), shirt)
+        _limb(frame, xy[elbow], xy[wrist], int(3 * unit), skin)
+
+    head = xy[NOSE]
+    _limb(frame, (xy[L_SHOULDER] + xy[R_SHOULDER]) // 2, head, int(3 * unit), skin)
+    radius = int(5.5 * unit)
+    cv2.ellipse(frame, tuple(head), (int(radius * 0.85), radius), 0, 0, 360, skin, -1, cv2.LINE_AA)
+    cv2.ellipse(frame, (head[0], head[1] - int(radius * 0.6)), (int(radius * 0.9), int(radius * 0.5)),
+                0, 180, 360, (30, 30, 50), -1, cv2.LINE_AA)
+    for side in (-1, 1):
+        eye = (head[0] + side * int(radius * 0.35), head[1] - int(radius * 0.1))
+        cv2.circle(frame, eye, max(1, int(radius * 0.12)), dark, -1, cv2.LINE_AA)
+    mouth_y = head[1] + int(radius * 0.45)
+    cv2.line(frame, (head[0] - int(radius * 0.3), mouth_y), (head[0] + int(radius * 0.3), mouth_y),
+             (60, 60, 150), max(1, int(radius * 0.1)))
+    return frame
+
+
+def write_clip(path, frames, fps, width, height, fourcc="mp4v"):
+    """Render a clip to `path`; returns the ground-truth landmark series."""
+    series = pose_series(frames, fps)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    try:
+        for landmarks in series:
+            out.write(render_frame(landmarks, width, height))
+    finally:
+        out.release()
+    return series
@@ -0,0 +1,152 @@
+import numpy as np
+from config import PoseLandmark
+
+NUM_LANDMARKS = 33
+RISK_LEVELS = ("Low", "Moderate", "High")
+JOINTS = ("back", "knees", "shoulders")
+
+_L = PoseLandmark
+
+# Joint angles as (p1, vertex, p3); a tuple of landmarks means their midpoint.
+# Add an entry here to get a new angle series from assess_landmarks.
+JOINT_ANGLES = {
+    "spine": (_L.LEFT_SHOULDER, (_L.LEFT_HIP, _L.RIGHT_HIP), _L.LEFT_HIP),
+    "left_knee": (_L.LEFT_HIP, _L.LEFT_KNEE, _L.LEFT_ANKLE),
+    "shoulder": (_L.LEFT_HIP, _L.LEFT_SHOULDER, _L.LEFT_ELBOW),
+}
+
+# Per joint: (angle series, high test, moderate test), mirroring assess_injury_risk.
+RISK_RULES = {
+    "back": ("spine", lambda a: a > 30, lambda a: a > 20),
+    "knees": ("left_knee", lambda a: a < 120, lambda a: a < 140),
+    "shoulders": ("shoulder", lambda a: a > 90, lambda a: a > 70),
+}
+
+# Analysis text per joint, indexed by risk level.
+RISK_MESSAGES = {
+    "back": (
+        "Good spinal alignment.",
+        "Moderate forward lean; monitor posture.",
+        "Excessive forward lean detected, increasing spinal strain."
+    ),
+    "knees": (
+        "Good knee alignment.",
+        "Moderate knee bend; consider strengthening exercises.",
+        "Excessive knee bend detected, potential for strain."
+    ),
+    "shoulders": (
+        "Good shoulder alignment.",
+        "Moderate shoulder rotation; ensure proper warm-up.",
+        "Excessive shoulder rotation detected, risk of strain."
+    ),
+}
+HIGH_SWING_SPEED = 50
+HIGH_SWING_SPEED_NOTE = " High swing speed increases shoulder strain."
+
+
+def landmarks_to_array(pose_landmarks):
+    """Convert a MediaPipe landmark list to a (33, 4) float32 array of x, y, z, visibility.
+
+    Frames without a detected pose become all-NaN rows.
+    """
+    if not pose_landmarks:
+        return np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark], dtype=np.float32)
+
+
+def array_to_landmarks(row):
+    """Inverse of landmarks_to_array: a MediaPipe landmark list, or None for an all-NaN row."""
+    if np.isnan(row).all():
+        return None
+    from mediapipe.framework.formats import landmark_pb2
+    pose_landmarks = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in row.tolist():
+        pose_landmarks.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return pose_landmarks
+
+
+def batch_angles(p1, p2, p3):
+    """Vectorised calculate_angle: angle at p2 for (..., 2) point arrays, in degrees."""
+    ab = p1 - p2
+    bc = p3 - p2
+    dot_product = ab[..., 0] * bc[..., 0] + ab[..., 1] * bc[..., 1]
+    magnitude_ab = np.linalg.norm(ab, axis=-1)
+    magnitude_bc = np.linalg.norm(bc, axis=-1)
+    degenerate = (magnitude_ab == 0) | (magnitude_bc == 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos_angle = np.clip(dot_product / (magnitude_ab * magnitude_bc), -1.0, 1.0)
+    return np.where(degenerate, 0.0, np.degrees(np.arccos(cos_angle)))
+
+
+def _points(xy, spec):
+    if isinstance(spec, tuple):
+        return (xy[:, spec[0]] + xy[:, spec[1]]) / 2
+    return xy[:, spec]
+
+
+def assess_landmarks(landmarks, frame_indices, frame_rate, frame_size, prior_wrists=()):
+    """Vectorised assess_injury_risk over a (frames, 33, 4) landmark array.
+
+    `prior_wrists` holds up to two (frame_index, x_px, y_px) right-wrist samples
+    from before this batch, so a clip can be assessed in consecutive batches.
+    Returns a dict of per-frame arrays: `detected`, one angle series per
+    JOINT_ANGLES entry, a risk level (0=Low, 1=Moderate, 2=High) per joint in
+    JOINTS, and `swing_speed` (NaN where assess_injury_risk reports none), plus
+    the `prior_wrists` to pass to the next batch.
+    """
+    landmarks = np.asarray(landmarks)
+    frame_indices = np.asarray(frame_indices)
+    xy = landmarks[..., :2].astype(np.float64)
+    detected = ~np.isnan(xy).any(axis=(1, 2))
+
+    result = {"detected": detected}
+    for name, (p1, p2, p3) in JOINT_ANGLES.items():
+        result[name] = batch_angles(_points(xy, p1), _points(xy, p2), _points(xy, p3))
+    for joint, (series, high, moderate) in RISK_RULES.items():
+        angle = result[series]
+        result[joint] = np.where(detected & high(angle), 2, np.where(detected & moderate(angle), 1, 0)).astype(np.int8)
+
+    # assess_injury_risk sees only the wrist positions of earlier detections, so
+    # a frame's speed comes from the two detections before it.
+    width, height = frame_size
+    wrist = xy[detected, _L.RIGHT_WRIST] * (width, height)
+    wrist_frames = np.concatenate([[f for f, _, _ in prior_wrists], frame_indices[detected]])
+    wrist_px = np.concatenate([np.reshape([(x, y) for _, x, y in prior_wrists], (-1, 2)), wrist])
+    steps = np.linalg.norm(wrist_px[1:] - wrist_px[:-1], axis=-1) * (frame_rate / np.diff(wrist_frames))
+    speeds = np.full(len(wrist_px), np.nan)
+    speeds[2:] = steps[:-1]
+    swing_speed = np.full(len(frame_indices), np.nan)
+    swing_speed[detected] = speeds[len(prior_wrists):]
+    result["swing_speed"] = swing_speed
+    result["prior_wrists"] = [(int(f), x, y) for f, (x, y) in zip(wrist_frames[-2:], wrist_px[-2:])]
+    return result
+
+
+def frame_records(assessment, frame_indices):
+    """Build frame_data entries matching those produced with assess_injury_risk."""
+    records = []
+    for row, frame_index in enumerate(frame_indices):
+        frame_index = int(frame_index)
+        if not assessment["detected"][row]:
+            records.append({
+                "frame": frame_index,
+                "injury_risk": {"back": "Low", "knees": "Low", "shoulders": "Low"},
+                "analysis": {"frame": frame_index, "status": "No pose detected"}
+            })
+            continue
+        injury_risk = {}
+        analysis = {}
+        for joint in JOINTS:
+            level = assessment[joint][row]
+            injury_risk[joint] = RISK_LEVELS[level]
+            analysis[joint] = RISK_MESSAGES[joint][level]
+        swing_speed = assessment["swing_speed"][row]
+        if not np.isnan(swing_speed):
+            analysis["swing_speed"] = f"Swing speed: {swing_speed:.2f} units/second"
+            # Fast swings only add a note: assess_injury_risk's max() over the
+            # level strings never raises the shoulder level.
+            if swing_speed > HIGH_SWING_SPEED:
+                analysis["shoulders"] += HIGH_SWING_SPEED_NOTE
+        records.append({"frame": frame_index, "injury_risk": injury_risk, "analysis": analysis})
+    return records
+
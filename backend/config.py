@@ -1,22 +1,192 @@
-
 import logging
 import os
-import mediapipe as mp
-from langchain.chat_models import init_chat_model
+import threading
+from enum import IntEnum
 
-logging.basicConfig(level=logging.DEBUG)
+# DEBUG also turns on every library's debug logging, which is costly on hot
+# paths; set LOG_LEVEL=DEBUG only when investigating.
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 os.environ["GROQ_API_KEY"] = "your_groq_api_key"
 
 
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils
+# MediaPipe and the chat model are imported and built on first use (see the
+# factories below), so processes that never analyse a video or call the LLM
+# start without paying for them.
+POSE_OPTIONS = {"static_image_mode": False, "model_complexity": 1, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+LLM_MODEL = "groq:llama3-8b-8192"
+
+# MediaPipe's 33 pose landmarks, so index lookups need not import mediapipe.
+PoseLandmark = IntEnum("PoseLandmark", [
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER", "RIGHT_EYE", "RIGHT_EYE_OUTER",
+    "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT", "MOUTH_RIGHT", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW",
+    "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST", "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX", "RIGHT_INDEX",
+    "LEFT_THUMB", "RIGHT_THUMB", "LEFT_HIP", "RIGHT_HIP", "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE",
+    "LEFT_HEEL", "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX",
+], start=0)
+
+_mediapipe_lock = threading.Lock()
+_mediapipe_solutions = None
+_llm_lock = threading.Lock()
+llm = None
+
+
+def _solutions():
+    global _mediapipe_solutions
+    with _mediapipe_lock:
+        if _mediapipe_solutions is None:
+            import mediapipe as mp
+            _mediapipe_solutions = mp.solutions
+        return _mediapipe_solutions
+
+
+def get_mp_pose():
+    """mediapipe.solutions.pose, imported on first use."""
+    return _solutions().pose
+
+
+def get_mp_drawing():
+    """mediapipe.solutions.drawing_utils, imported on first use."""
+    return _solutions().drawing_utils
+
+
+def new_pose():
+    """A fresh MediaPipe Pose graph built from POSE_OPTIONS."""
+    return get_mp_pose().Pose(**POSE_OPTIONS)
+
+
+def get_llm():
+    """The process-wide chat model, created on first use.
+
+    Assigning config.llm beforehand (e.g. a stub in benchmarks) takes precedence.
+    """
+    global llm
+    with _llm_lock:
+        if llm is None:
+            from langchain.chat_models import init_chat_model
+            llm = init_chat_model(LLM_MODEL)
+        return llm
+
+
+# Max frames buffered between pipeline stages (reader -> pose -> annotate -> writer)
+PIPELINE_QUEUE_SIZE = 8
+# Frames the annotate stage holds while batching risk assessment
+ANNOTATE_BATCH_SIZE = 8
+
+# Adaptive temporal sampling: pose inferences spent per clip, the share used by
+# the coarse pass, how far above the median wrist speed counts as a swing, and
+# the gap (in frames) beyond which seeking beats grab()-ing forward.
+ANALYSIS_FRAME_BUDGET = 100
+COARSE_BUDGET_FRACTION = 0.5
+SWING_SPIKE_FACTOR = 1.5
+SEEK_THRESHOLD = 32
+
+# Process-pool pose inference. POSE_WORKERS = 1 keeps the serial path; chunks
+# are re-seeded with POSE_CHUNK_OVERLAP frames of tracking history.
+POSE_WORKERS = 1
+POSE_CHUNK_SIZE = 64
+POSE_CHUNK_OVERLAP = 4
+
+# On-disk analysis results, keyed by video content hash + analysis parameters.
+# Least recently used entries are evicted past the size or age limit. Content
+# hashes are memoised in memory for the HASH_MEMO_SIZE most recent files.
+ANALYSIS_CACHE_DIR = os.path.join("static", "cache")
+ANALYSIS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+ANALYSIS_CACHE_MAX_AGE = 7 * 24 * 3600
+HASH_MEMO_SIZE = 1024
+
+# Idle seconds before a session's exec variables and last analysis are dropped
+SESSION_TTL = 3600
+
+# Background analysis jobs: queue backend ("memory" or "sqlite"), worker threads,
+# and the queue depth past which POST /jobs is refused with 429.
+JOB_QUEUE_BACKEND = "memory"
+JOB_DB_PATH = os.path.join("static", "jobs.sqlite3")
+JOB_WORKERS = 2
+JOB_QUEUE_MAX_DEPTH = 32
+JOB_POLL_INTERVAL = 0.5
+# SQLite queue: seconds between heartbeats of a worker's running jobs, and
+# heartbeat age after which a running job counts as abandoned and is re-queued.
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_STALE_AFTER = 60
+
+# Sandboxed workers for advanced_image_processor snippets: pool size, wall-clock
+# timeout and CPU seconds per call, and each worker's address-space limit.
+SANDBOX_WORKERS = os.cpu_count() or 2
+SANDBOX_TIMEOUT = 30
+SANDBOX_CPU_SECONDS = 20
+SANDBOX_MEMORY_BYTES = 4 * 1024 * 1024 * 1024
+
+# Decoded images kept in shared memory for advanced_image_processor, LRU by bytes
+IMAGE_STORE_MAX_BYTES = 256 * 1024 * 1024
+
+# Output video codecs in order of preference, as (fourcc, extension); the first
+# one this OpenCV build can open is probed once and reused. VIDEO_FRAGMENTED_MP4
+# writes fragmented MP4 through FFMPEG_BINARY instead, when it is on PATH.
+VIDEO_CODECS = (("avc1", ".mp4"), ("H264", ".mp4"), ("mp4v", ".mp4"), ("XVID", ".avi"), ("MJPG", ".avi"))
+VIDEO_FRAGMENTED_MP4 = False
+FFMPEG_BINARY = "ffmpeg"
+
+# /video and /image caching: max-age for uuid-named (immutable) files, and an
+# optional offload of the body to the front-end server: None, "x-sendfile"
+# (Apache/lighttpd) or "x-accel" (nginx, internal location MEDIA_ACCEL_PREFIX).
+MEDIA_MAX_AGE = 365 * 24 * 3600
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_PREFIX = "/protected/"
+
+# Resumable uploads: destination, bytes read per write, bytes after which the
+# container metadata is probed, and idle seconds before an unfinished upload is dropped.
+UPLOAD_DIR = os.path.join("static", "uploads")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_PROBE_BYTES = 2 * 1024 * 1024
+UPLOAD_TTL = 24 * 3600
+# Container extensions an upload may keep; anything else is stored as .mp4.
+UPLOAD_EXTENSIONS = ("mp4", "mov", "m4v", "avi", "mkv", "webm")
+
+# Landmark smoothing for swing kinematics: "one_euro" (handles the uneven steps
+# of adaptive sampling), "savgol" (assumes even spacing) or None. The swing is
+# the span around peak wrist speed staying above SWING_SPEED_FRACTION of it.
+KINEMATICS_FILTER = "one_euro"
+ONE_EURO_MIN_CUTOFF = 2.0
+ONE_EURO_BETA = 0.01
+ONE_EURO_D_CUTOFF = 1.0
+SAVGOL_WINDOW = 7
+SAVGOL_ORDER = 2
+SWING_SPEED_FRACTION = 0.25
+
+# Pose inference on a crop around the previous detection: box padding as a
+# fraction of the pose size, longest side fed to the model, and the frame gap
+# after which the full frame is searched again.
+ROI_TRACKING = True
+ROI_MARGIN = 0.25
+ROI_INPUT_SIZE = 384
+ROI_MAX_GAP = 4
+
+# Clips analysed at once by batch.py
+BATCH_WORKERS = max(1, (os.cpu_count() or 2) // 2)
 
+# Warm-up on app start (LLM client, graph, one dummy pose inference, codec
+# probe), and the cold-start time benchmarks/bench_suite.py checks against.
+WARMUP_ON_START = True
+COLD_START_BUDGET_SECONDS = 15
 
-llm = init_chat_model("groq:llama3-8b-8192")
+# Swing phases (stance, backlift, downswing, impact, follow-through): the
+# wrist counts as still below PHASE_MOTION_FRACTION of its peak speed, and
+# impact spans IMPACT_WINDOW seconds either side of that peak. A clip whose
+# peak wrist speed stays under MIN_SWING_SPEED (pixels/second) has no swing.
+PHASE_MOTION_FRACTION = 0.15
+IMPACT_WINDOW = 0.04
+MIN_SWING_SPEED = 100.0
 
+# Reference-stroke templates: where they are stored, the length every swing is
+# resampled to, the DTW band as a fraction of that length, and how many
+# templates are compared exactly per LB_Keogh pruning round.
+TEMPLATE_DIR = os.path.join("static", "templates")
+TEMPLATE_LENGTH = 64
+DTW_BAND = 0.1
+DTW_BATCH_SIZE = 64
+COMPARE_TOP_K = 3
 
-persistent_vars = {}
-analysis_cache = {}
\ No newline at end of file
+# Per-player session history (SQLite) behind /players/<id>/trends
+HISTORY_DB_PATH = os.path.join("static", "history.sqlite3")
@@ -0,0 +1,177 @@
+import numpy as np
+from biomechanics import JOINTS, JOINT_ANGLES, RISK_LEVELS, RISK_MESSAGES, HIGH_SWING_SPEED, HIGH_SWING_SPEED_NOTE, frame_records
+
+# Interned analysis messages: every per-joint string frame_data can contain, so
+# frames store a small id instead of the text.
+MESSAGES = tuple(
+    [RISK_MESSAGES[joint][level] for joint in JOINTS for level in range(len(RISK_LEVELS))]
+    + [RISK_MESSAGES["shoulders"][level] + HIGH_SWING_SPEED_NOTE for level in range(len(RISK_LEVELS))]
+)
+NO_MESSAGE = 255
+
+
+class FrameTable:
+    """Per-frame analysis results as columns of numbers rather than a list of dicts.
+
+    Columns: frame (int32), detected (bool), risk (int8, frames x JOINTS, 0=Low
+    1=Moderate 2=High), angles (float32, frames x JOINT_ANGLES, degrees) and
+    swing_speed (float64, NaN where none was measured).
+    """
+
+    def __init__(self, frame, detected, risk, angles, swing_speed):
+        self.frame = np.asarray(frame, dtype=np.int32)
+        self.detected = np.asarray(detected, dtype=bool)
+        self.risk = np.asarray(risk, dtype=np.int8)
+        self.angles = np.asarray(angles, dtype=np.float32)
+        self.swing_speed = np.asarray(swing_speed, dtype=np.float64)
+
+    @classmethod
+    def from_assessment(cls, assessment, frame_indices):
+        """Build a table from the output of biomechanics.assess_landmarks."""
+        return cls(
+            frame_indices,
+            assessment["detected"],
+            np.stack([assessment[joint] for joint in JOINTS], axis=1),
+            np.stack([assessment[name] for name in JOINT_ANGLES], axis=1),
+            assessment["swing_speed"]
+        )
+
+    @classmethod
+    def concatenate(cls, tables):
+        """One table from consecutive tables, e.g. the batches of a clip assessed in order."""
+        return cls(
+            np.concatenate([table.frame for table in tables]),
+            np.concatenate([table.detected for table in tables]),
+            np.concatenate([table.risk for table in tables]),
+            np.concatenate([table.angles for table in tables]),
+            np.concatenate([table.swing_speed for table in tables])
+        )
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _assessment(self):
+        assessment = {"detected": self.detected, "swing_speed": self.swing_speed}
+        for column, joint in enumerate(JOINTS):
+            assessment[joint] = self.risk[:, column]
+        return assessment
+
+    def max_risk(self):
+        """Worst risk level per joint across the clip, as level names."""
+        worst = self.risk.max(axis=0, initial=0)
+        return {joint: RISK_LEVELS[int(level)] for joint, level in zip(JOINTS, worst)}
+
+    def message_ids(self):
+        """(frames, JOINTS) uint8 ids into MESSAGES; NO_MESSAGE where no pose was detected."""
+        ids = self.risk.astype(np.uint8) + np.arange(len(JOINTS), dtype=np.uint8) * len(RISK_LEVELS)
+        shoulders = JOINTS.index("shoulders")
+        with np.errstate(invalid="ignore"):
+            fast = self.swing_speed > HIGH_SWING_SPEED
+        ids[fast, shoulders] = len(JOINTS) * len(RISK_LEVELS) + self.risk[fast, shoulders]
+        ids[~self.detected] = NO_MESSAGE
+        return ids
+
+    def to_records(self):
+        """The legacy frame_data list of dicts."""
+        return frame_records(self._assessment(), self.frame)
+
+    def iter_records(self, batch_size=256):
+        """Yield frame_data dicts without building the whole list."""
+        for start in range(0, len(self), batch_size):
+            rows = slice(start, start + batch_size)
+            assessment = {name: column[rows] for name, column in self._assessment().items()}
+            yield from frame_records(assessment, self.frame[rows])
+
+    def row(self, frame):
+        """Row of the analysed frame nearest to `frame` (frames are ascending), found by bisection."""
+        position = int(np.searchsorted(self.frame, frame))
+        if position == len(self.frame) or (position > 0 and frame - self.frame[position - 1] <= self.frame[position] - frame):
+            position -= 1
+        return max(position, 0)
+
+    def snapshot(self, frame):
+        """Angles, risk and swing speed at the analysed frame nearest to `frame`."""
+        row = self.row(frame)
+        speed = self.swing_speed[row]
+        return {
+            "frame": int(self.frame[row]),
+            "detected": bool(self.detected[row]),
+            "injury_risk": {joint: RISK_LEVELS[level] for joint, level in zip(JOINTS, self.risk[row])},
+            "angles": {name: round(float(angle), 2) for name, angle in zip(JOINT_ANGLES, self.angles[row])},
+            "swing_speed": None if np.isnan(speed) else float(speed),
+        }
+
+    def to_compact(self):
+        """Columnar JSON-ready form: number lists plus the interned message table."""
+        ids = self.message_ids()
+        return {
+            "frame": self.frame.tolist(),
+            "detected": self.detected.tolist(),
+            "risk_levels": list(RISK_LEVELS),
+            "risk": {joint: self.risk[:, column].tolist() for column, joint in enumerate(JOINTS)},
+            "angles": {name: np.round(self.angles[:, column], 2).tolist() for column, name in enumerate(JOINT_ANGLES)},
+            "swing_speed": [None if np.isnan(v) else float(v) for v in self.swing_speed],
+            "messages": list(MESSAGES),
+            "message_ids": {joint: ids[:, column].tolist() for column, joint in enumerate(JOINTS)},
+        }
+
+    @classmethod
+    def from_compact(cls, compact):
+        """Rebuild a table from to_compact() output."""
+        return cls(
+            compact["frame"],
+            compact["detected"],
+            np.stack([compact["risk"][joint] for joint in JOINTS], axis=1).reshape(-1, len(JOINTS)),
+            np.stack([compact["angles"][name] for name in JOINT_ANGLES], axis=1).reshape(-1, len(JOINT_ANGLES)),
+            [np.nan if v is None else v for v in compact["swing_speed"]]
+        )
+
+    def save_npz(self, path):
+        np.savez_compressed(
+            path, frame=self.frame, detected=self.detected, risk=self.risk, angles=self.angles,
+            swing_speed=self.swing_speed, joints=np.array(JOINTS), angle_names=np.array(list(JOINT_ANGLES))
+        )
+
+    @classmethod
+    def load_npz(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["frame"], arrays["detected"], arrays["risk"], arrays["angles"], arrays["swing_speed"])
+
+    def to_arrow(self):
+        """A pyarrow Table with one column per series (requires pyarrow)."""
+        import pyarrow as pa
+
+        columns = {"frame": self.frame, "detected": self.detected}
+        for column, joint in enumerate(JOINTS):
+            columns[f"risk_{joint}"] = self.risk[:, column]
+        for column, name in enumerate(JOINT_ANGLES):
+            columns[f"angle_{name}"] = self.angles[:, column]
+        columns["swing_speed"] = self.swing_speed
+        return pa.table(columns)
+
+
+def keyframe_metrics(results):
+    """Per keyframe of the results' swing_index, the snapshot at that frame; {} without an index."""
+    swing_index = results.get("swing_index")
+    if not swing_index:
+        return {}
+    table = results["frame_table"]
+    return {name: table.snapshot(frame) for name, frame in swing_index["keyframes"].items()}
+
+
+def deserialize_results(serialized):
+    """Inverse of serialize_results(..., compact=True)."""
+    results = {k: v for k, v in serialized.items() if k != "frame_table"}
+    results["frame_table"] = FrameTable.from_compact(serialized["frame_table"])
+    return results
+
+
+def serialize_results(results, compact=False):
+    """JSON-ready copy of an analysis result: frame_data records by default, or the columnar frame_table."""
+    serialized = {k: v for k, v in results.items() if k != "frame_table"}
+    if "frame_table" in results:
+        if compact:
+            serialized["frame_table"] = results["frame_table"].to_compact()
+        else:
+            serialized["frame_data"] = results["frame_table"].to_records()
+    return serialized
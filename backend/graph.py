@@ -4,9 +4,22 @@ from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-import json
-from config import llm, logger
-from tools import video_pose_estimation_tool, advanced_image_processor
+import re
+import threading
+from config import get_llm, logger
+from metrics import timed
+from tools import video_pose_estimation_tool, advanced_image_processor, analyze_video
+
+# Requests with a video attached that ask for an analysis (an analysis verb and
+# a reference to the video) skip the tool-selection LLM call; anything else,
+# e.g. a question that merely mentions risk or the swing, goes to the agent.
+ANALYSIS_VERB = re.compile(r"\b(analy[sz]e|assess|evaluate|examine|review|check)\b", re.IGNORECASE)
+VIDEO_REFERENCE = re.compile(r"\b(video|clip|footage|recording|batting|swing|technique|stroke|shot)s?\b", re.IGNORECASE)
+
+
+def wants_analysis(text):
+    """True if a message explicitly asks for the attached video to be analysed."""
+    return bool(ANALYSIS_VERB.search(text) and VIDEO_REFERENCE.search(text))
 
 class State(TypedDict):
     messages: Annotated[list[dict], add_messages]
@@ -18,11 +31,15 @@ class State(TypedDict):
     analysis_results: dict
     video_path: str
     frame_data: List[Dict]
+    session_id: str
+    structured_output: bool
+    analysis_only: bool
 
 def make_tool_graph():
     """Create and configure the LangGraph for tool execution."""
     tools = [video_pose_estimation_tool, advanced_image_processor]
     tool_node = ToolNode(tools)
+    llm = get_llm()
     llm_with_tools = llm.bind_tools(tools)
 
     def call_llm_model(state: State):
@@ -45,22 +62,27 @@ Always:
 4. Provide detailed biomechanical analysis and exercise suggestions
 """
         try:
-            messages = state["messages"]
+            messages = list(state["messages"])
             
-            if not any(msg.get('role') == 'system' for msg in messages):
-                messages = [{"role": "system", "content": system_prompt}] + messages
+            if not any(isinstance(msg, SystemMessage) for msg in messages):
+                messages = [SystemMessage(content=system_prompt)] + messages
             
             if state.get("video_path"):
                 last_human_msg = None
                 for i, msg in enumerate(messages):
-                    if msg.get('role') == 'user':
+                    if isinstance(msg, HumanMessage):
                         last_human_msg = i
                 
-                if last_human_msg is not None and "video_path" not in messages[last_human_msg]['content']:
-                    messages[last_human_msg]['content'] += f"\nVideo path: {state['video_path']}"
+                # Mention the path in a copy so the message stored in state is untouched.
+                if last_human_msg is not None and state["video_path"] not in messages[last_human_msg].content:
+                    messages[last_human_msg] = HumanMessage(
+                        content=f"{messages[last_human_msg].content}\nVideo path: {state['video_path']}"
+                    )
             
-            response = llm_with_tools.invoke(messages)
-            return {"messages": [{"role": "assistant", "content": response.content}], "video_path": state.get("video_path", "")}
+            # Keep the full AIMessage so its tool calls reach the tool node.
+            with timed("llm_tool_selection"):
+                response = llm_with_tools.invoke(messages)
+            return {"messages": [response], "video_path": state.get("video_path", "")}
             
         except Exception as e:
             logger.error(f"LLM call error: {e}")
@@ -70,13 +92,70 @@ Always:
                 "video_path": state.get("video_path", "")
             }
 
+    def route_request(state: State):
+        """Send plain video-analysis requests straight to the analysis, everything else to the LLM."""
+        last_human = next((msg for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage)), None)
+        if state.get("video_path") and last_human is not None and wants_analysis(last_human.content):
+            return "video_analysis"
+        return "tool_calling_llm"
+
+    def run_video_analysis(state: State):
+        """Run the video analysis directly, without an LLM deciding to call the tool."""
+        summary, results = analyze_video(state["video_path"], render=not state.get("analysis_only"))
+        if results is None:
+            return {"messages": [AIMessage(content=summary)]}
+        update = {
+            "analysis_results": results,
+            "output_video_path": results["output_video_path"] or "",
+            "intermediate_outputs": [{"output": summary, "operation_type": "video_analysis"}]
+        }
+        if state.get("structured_output"):
+            update["messages"] = [AIMessage(content=summary)]
+        return update
+
+    def after_video_analysis(state: State):
+        if not state.get("analysis_results") or state.get("structured_output"):
+            return END
+        return "narrate_analysis"
+
+    def narrate_analysis(state: State):
+        """One LLM call, without tools, to explain the finished analysis to the user."""
+        summary = state["intermediate_outputs"][-1]["output"]
+        question = next(msg.content for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage))
+        try:
+            with timed("llm_narration"):
+                response = llm.invoke([
+                    SystemMessage(content=(
+                        "You are an expert biomechanics AI assistant specializing in cricket batting analysis. "
+                        "Explain the analysis results below to the user, covering injury risk and the recommended exercises."
+                    )),
+                    HumanMessage(content=f"{question}\n\nAnalysis results:\n{summary}")
+                ])
+            return {"messages": [response]}
+        except Exception as e:
+            logger.error(f"LLM narration error: {e}")
+            return {"messages": [AIMessage(content=summary)]}
+
     builder = StateGraph(State)
     builder.add_node("tool_calling_llm", call_llm_model)
     builder.add_node("tools", tool_node)
-    builder.add_edge(START, "tool_calling_llm")
+    builder.add_node("video_analysis", run_video_analysis)
+    builder.add_node("narrate_analysis", narrate_analysis)
+    builder.add_conditional_edges(START, route_request, ["video_analysis", "tool_calling_llm"])
+    builder.add_conditional_edges("video_analysis", after_video_analysis, ["narrate_analysis", END])
+    builder.add_edge("narrate_analysis", END)
     builder.add_conditional_edges("tool_calling_llm", tools_condition)
     builder.add_edge("tools", "tool_calling_llm")
     
     return builder.compile()
 
-tool_agent = make_tool_graph()
\ No newline at end of file
+_tool_agent = None
+_tool_agent_lock = threading.Lock()
+
+def get_tool_agent():
+    """The compiled graph, built on first use rather than at import."""
+    global _tool_agent
+    with _tool_agent_lock:
+        if _tool_agent is None:
+            _tool_agent = make_tool_graph()
+        return _tool_agent
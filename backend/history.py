@@ -0,0 +1,186 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config import logger, HISTORY_DB_PATH
+from biomechanics import JOINTS, JOINT_ANGLES
+from kinematics import PHASES
+
+# Numeric columns per session; per-joint risk is the worst level (0-2) and the
+# mean level over frames with a pose, angles are means in degrees.
+SESSION_METRICS = (
+    [f"{joint}_risk_max" for joint in JOINTS]
+    + [f"{joint}_risk_mean" for joint in JOINTS]
+    + [f"{name}_angle_mean" for name in JOINT_ANGLES]
+    + ["peak_swing_speed", "swing_duration", "frames", "frame_rate"]
+)
+# Per phase of the swing_index: mean risk level and mean angle over its frames.
+PHASE_METRICS = [f"{joint}_risk_mean" for joint in JOINTS] + [f"{name}_angle_mean" for name in JOINT_ANGLES] + ["frames"]
+BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+
+def _mean(values):
+    return float(values.mean()) if len(values) else None
+
+
+def session_metrics(results):
+    """SESSION_METRICS for one analysis, from its frame table and kinematics."""
+    table = results["frame_table"]
+    detected = table.detected
+    swing = (results.get("kinematics") or {}).get("swing") or {}
+    metrics = {"frames": int(results["total_frames"]), "frame_rate": float(results["frame_rate"] or 0),
+               "peak_swing_speed": swing.get("peak_speed"), "swing_duration": (swing.get("window") or {}).get("duration")}
+    for column, joint in enumerate(JOINTS):
+        risk = table.risk[detected, column]
+        metrics[f"{joint}_risk_max"] = int(risk.max()) if len(risk) else None
+        metrics[f"{joint}_risk_mean"] = _mean(risk)
+    for column, name in enumerate(JOINT_ANGLES):
+        metrics[f"{name}_angle_mean"] = _mean(table.angles[detected, column])
+    return metrics
+
+
+def phase_metrics(results):
+    """PHASE_METRICS per phase of the swing_index, skipping phases the clip does not have."""
+    phases = (results.get("swing_index") or {}).get("phases") or {}
+    table = results["frame_table"]
+    rows = {}
+    for phase, span in phases.items():
+        if not span:
+            continue
+        selected = table.detected & (table.frame >= span["start_frame"]) & (table.frame <= span["end_frame"])
+        metrics = {"frames": int(selected.sum())}
+        for column, joint in enumerate(JOINTS):
+            metrics[f"{joint}_risk_mean"] = _mean(table.risk[selected, column])
+        for column, name in enumerate(JOINT_ANGLES):
+            metrics[f"{name}_angle_mean"] = _mean(table.angles[selected, column])
+        rows[phase] = metrics
+    return rows
+
+
+class HistoryStore:
+    """Per-session summaries and per-phase metrics in SQLite, indexed by player and date.
+
+    A session is one analysed clip for one player; recording the same clip
+    for the same player again replaces it. Trend queries read only these rows,
+    never the video or frame data.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        session_columns = ", ".join(f"{name} REAL" for name in SESSION_METRICS)
+        phase_columns = ", ".join(f"{name} REAL" for name in PHASE_METRICS)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY, player_id TEXT NOT NULL, recorded REAL NOT NULL,
+                    video_hash TEXT, video_path TEXT, {session_columns}
+                )
+            """)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS phases (
+                    session_id TEXT NOT NULL, player_id TEXT NOT NULL, recorded REAL NOT NULL,
+                    phase TEXT NOT NULL, {phase_columns},
+                    PRIMARY KEY (session_id, phase)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_player_recorded ON sessions (player_id, recorded)")
+            conn.execute("CREATE INDEX IF NOT EXISTS phases_player_phase_recorded ON phases (player_id, phase, recorded)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def record(self, player_id, results, video_hash, video_path=None, recorded=None):
+        """Store one analysed session for `player_id`; returns its id."""
+        session_id = hashlib.sha256(f"{player_id}:{video_hash}".encode()).hexdigest()[:32]
+        recorded = time.time() if recorded is None else recorded
+        session = {"id": session_id, "player_id": player_id, "recorded": recorded,
+                   "video_hash": video_hash, "video_path": video_path, **session_metrics(results)}
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"INSERT OR REPLACE INTO sessions ({', '.join(session)}) VALUES ({', '.join('?' * len(session))})",
+                list(session.values())
+            )
+            conn.execute("DELETE FROM phases WHERE session_id = ?", (session_id,))
+            columns = ["session_id", "player_id", "recorded", "phase", *PHASE_METRICS]
+            conn.executemany(
+                f"INSERT INTO phases ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [[session_id, player_id, recorded, phase, *(metrics[name] for name in PHASE_METRICS)]
+                 for phase, metrics in phase_metrics(results).items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        logger.debug(f"Recorded session {session_id} for player {player_id}")
+        return session_id
+
+    def trends(self, player_id, metrics, phase=None, since=None, until=None, bucket=None):
+        """Values of `metrics` over time for one player, plus count/mean/min/max of each.
+
+        Reads the sessions table, or the phases table for one `phase`. `since`
+        and `until` are unix times (inclusive). With `bucket` ("day", "week" or
+        "month") the points are per-bucket means instead of per session.
+        """
+        allowed = PHASE_METRICS if phase else SESSION_METRICS
+        unknown = [name for name in metrics if name not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+        if phase and phase not in PHASES:
+            raise ValueError(f"Unknown phase: {phase}")
+        if bucket is not None and bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}")
+
+        table = "phases" if phase else "sessions"
+        conditions = ["player_id = ?"]
+        params = [player_id]
+        if phase:
+            conditions.append("phase = ?")
+            params.append(phase)
+        if since is not None:
+            conditions.append("recorded >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("recorded <= ?")
+            params.append(until)
+        where = " AND ".join(conditions)
+
+        if bucket:
+            period = f"strftime('{BUCKETS[bucket]}', recorded, 'unixepoch')"
+            query = (f"SELECT {period} AS period, COUNT(*), {', '.join(f'AVG({name})' for name in metrics)} "
+                     f"FROM {table} WHERE {where} GROUP BY period ORDER BY period")
+            point_keys = ["period", "sessions", *metrics]
+        else:
+            query = f"SELECT recorded, {', '.join(metrics)} FROM {table} WHERE {where} ORDER BY recorded"
+            point_keys = ["recorded", *metrics]
+        summary_query = (
+            f"SELECT COUNT(*), {', '.join(f'AVG({name}), MIN({name}), MAX({name})' for name in metrics)} "
+            f"FROM {table} WHERE {where}"
+        )
+        with self._connect() as conn:
+            points = [dict(zip(point_keys, row)) for row in conn.execute(query, params)]
+            totals = conn.execute(summary_query, params).fetchone()
+        summary = {"sessions": totals[0]}
+        for i, name in enumerate(metrics):
+            mean, low, high = totals[1 + 3 * i:4 + 3 * i]
+            summary[name] = {"mean": mean, "min": low, "max": high}
+        return {"player_id": player_id, "phase": phase, "bucket": bucket, "summary": summary, "points": points}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Return the process-wide history store, created on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
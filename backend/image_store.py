@@ -0,0 +1,141 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from PIL import Image
+from config import logger, IMAGE_STORE_MAX_BYTES
+
+
+class _Entry:
+    def __init__(self, image):
+        self.block = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+        self.array = np.ndarray(image.shape, dtype=image.dtype, buffer=self.block.buf)
+        self.array[...] = image
+        self.array.flags.writeable = False
+        self.nbytes = image.nbytes
+        self.pins = 0
+
+    @property
+    def ref(self):
+        """Picklable handle a worker process can attach to."""
+        return self.block.name, self.array.shape, self.array.dtype.str
+
+    def release(self):
+        self.array = None
+        self.block.close()
+        self.block.unlink()
+
+
+class ImageStore:
+    """Decodes each image file once and keeps its pixels in shared memory.
+
+    Entries are keyed on (path, size, mtime), so an overwritten file is decoded
+    again. Least recently used entries are dropped past `max_bytes`, except
+    those pinned by an in-flight borrow().
+    """
+
+    def __init__(self, max_bytes=IMAGE_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _key(self, path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    @contextmanager
+    def borrow(self, path):
+        """Pin the decoded image for `path` for the duration of the block.
+
+        Yields the store entry (read-only `array`, shared-memory `ref`), or None
+        if the file cannot be decoded.
+        """
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.pins += 1
+        if entry is None:
+            image = cv2.imread(path)
+            if image is None:
+                yield None
+                return
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry(image)
+                    self._bytes += entry.nbytes
+                    logger.debug(f"Image store decoded {path} ({entry.nbytes} bytes)")
+                entry.pins += 1
+                self._evict()
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                self._evict()
+
+    def _evict(self):
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.pins:
+                continue
+            del self._entries[key]
+            self._bytes -= entry.nbytes
+            entry.release()
+
+    def close(self):
+        """Release every entry, pinned or not; the store is unusable afterwards."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._bytes = 0
+        for entry in entries:
+            entry.release()
+
+
+def attach_image(ref):
+    """Private, writable copy of a shared image, so snippets can draw on it freely.
+
+    The handoff itself is not zero-copy: the file is decoded once and shared,
+    but each snippet run copies the pixels out of the segment (one memcpy,
+    no decode). Snippets commonly draw on `image` in place, which a read-only
+    view of the shared segment would break.
+    """
+    name, shape, dtype = ref
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf).copy()
+    finally:
+        block.close()
+
+
+def pil_view(image):
+    """PIL image for a decoded ndarray.
+
+    Images are decoded with cv2.imread's default 3-channel BGR, so this is
+    always an RGB copy.
+    """
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore()
+            # Shared-memory segments outlive the process unless unlinked.
+            atexit.register(_store.close)
+        return _store
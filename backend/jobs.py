@@ -0,0 +1,265 @@
+import json
+import os
+import socket
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from config import (logger, JOB_QUEUE_BACKEND, JOB_DB_PATH, JOB_WORKERS, JOB_QUEUE_MAX_DEPTH,
+                    JOB_POLL_INTERVAL, JOB_HEARTBEAT_INTERVAL, JOB_STALE_AFTER)
+from tools import analyze_video
+from frame_table import serialize_results
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+
+def _new_job(video_path):
+    now = time.time()
+    return {
+        "id": str(uuid.uuid4()),
+        "video_path": video_path,
+        "status": "queued",
+        "stage": "queued",
+        "frames_processed": 0,
+        "frames_planned": 0,
+        "summary": None,
+        "results": None,
+        "error": None,
+        "created": now,
+        "updated": now
+    }
+
+
+class InMemoryJobQueue:
+    """Jobs held in this process; lost on restart."""
+
+    def __init__(self):
+        self._pending = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+        self._pending.put(job["id"])
+
+    def claim(self, timeout):
+        """Take the next queued job and mark it running, or return None after `timeout`."""
+        try:
+            job_id = self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.update(job_id, status="running")
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updated=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def depth(self):
+        return self._pending.qsize()
+
+
+class SqliteJobQueue:
+    """Jobs persisted in SQLite, so they survive restarts and can be shared by several processes.
+
+    A running job records the queue instance that claimed it (claimed_by) and
+    that instance refreshes its `updated` time every JOB_HEARTBEAT_INTERVAL.
+    Only running jobs whose heartbeat is older than JOB_STALE_AFTER, i.e.
+    whose process has died, are queued again.
+    """
+
+    _FIELDS = ("id", "video_path", "status", "stage", "frames_processed", "frames_planned",
+               "summary", "results", "error", "created", "updated")
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._heartbeat = None
+        self._heartbeat_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, video_path TEXT, status TEXT, stage TEXT,
+                    frames_processed INTEGER, frames_planned INTEGER,
+                    summary TEXT, results TEXT, error TEXT, created REAL, updated REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "claimed_by" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN claimed_by TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+            self._requeue_stale(conn)
+
+    def _requeue_stale(self, conn):
+        """Queue again the running jobs whose owner has stopped sending heartbeats."""
+        requeued = conn.execute(
+            "UPDATE jobs SET status = 'queued', stage = 'queued', claimed_by = NULL "
+            "WHERE status = 'running' AND updated < ?",
+            (time.time() - JOB_STALE_AFTER,)
+        ).rowcount
+        if requeued:
+            logger.info(f"Re-queued {requeued} jobs abandoned by a stopped worker")
+
+    def _start_heartbeat(self):
+        with self._heartbeat_lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET updated = ? WHERE status = 'running' AND claimed_by = ?",
+                                 (time.time(), self.owner))
+                    self._requeue_stale(conn)
+            except sqlite3.Error as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _row_to_job(self, row):
+        job = dict(zip(self._FIELDS, row))
+        job["results"] = json.loads(job["results"]) if job["results"] else None
+        return job
+
+    def submit(self, job):
+        row = dict(job, results=json.dumps(job["results"]) if job["results"] else None)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(self._FIELDS)}) VALUES ({', '.join('?' * len(self._FIELDS))})",
+                [row[field] for field in self._FIELDS]
+            )
+
+    def claim(self, timeout):
+        """Take the oldest queued job and mark it running, polling for up to `timeout` seconds."""
+        self._start_heartbeat()
+        deadline = time.time() + timeout
+        while True:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE jobs SET status = 'running', claimed_by = ?, updated = ? WHERE id = ?",
+                                 (self.owner, time.time(), row[0]))
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+            if row:
+                return self.get(row[0])
+            if time.time() >= deadline:
+                return None
+            time.sleep(JOB_POLL_INTERVAL)
+
+    def update(self, job_id, **fields):
+        if "results" in fields:
+            fields["results"] = json.dumps(fields["results"]) if fields["results"] else None
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(self._FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def depth(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+
+QUEUE_BACKENDS = {
+    "memory": InMemoryJobQueue,
+    "sqlite": SqliteJobQueue,
+}
+
+
+class JobRunner:
+    """A pool of worker threads that run queued video analyses."""
+
+    def __init__(self, job_queue, workers=JOB_WORKERS, max_depth=JOB_QUEUE_MAX_DEPTH):
+        self.queue = job_queue
+        self.workers = workers
+        self.max_depth = max_depth
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, video_path):
+        """Queue an analysis and return its job, or raise QueueFull past the depth limit."""
+        if self.queue.depth() >= self.max_depth:
+            raise QueueFull(f"Job queue is full ({self.max_depth} jobs waiting)")
+        self.start()
+        job = _new_job(video_path)
+        self.queue.submit(job)
+        logger.debug(f"Queued job {job['id']} for {video_path}")
+        return job
+
+    def _work(self):
+        while True:
+            job = self.queue.claim(timeout=JOB_POLL_INTERVAL)
+            if job is not None:
+                self._run(job)
+
+    def _run(self, job):
+        job_id = job["id"]
+        last = {"stage": None, "time": 0.0}
+
+        def progress(stage, frames_processed, frames_planned):
+            # Stage changes are always recorded; per-frame counts at most once per poll interval.
+            now = time.time()
+            if stage == last["stage"] and now - last["time"] < JOB_POLL_INTERVAL:
+                return
+            last.update(stage=stage, time=now)
+            self.queue.update(job_id, stage=stage, frames_processed=frames_processed, frames_planned=frames_planned)
+
+        try:
+            summary, results = analyze_video(job["video_path"], progress=progress)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.queue.update(job_id, status="failed", stage="failed", error=str(e))
+            return
+        if results is None:
+            self.queue.update(job_id, status="failed", stage="failed", error=summary)
+        else:
+            self.queue.update(job_id, status="done", stage="done", summary=summary,
+                              results=serialize_results(results, compact=True),
+                              frames_processed=results["total_frames"], frames_planned=results["total_frames"])
+        logger.debug(f"Job {job_id} finished")
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Return the process-wide job runner, built on first use from the configured backend."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(QUEUE_BACKENDS[JOB_QUEUE_BACKEND]())
+        return _runner
@@ -0,0 +1,222 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from config import (
+    PoseLandmark, KINEMATICS_FILTER, ONE_EURO_MIN_CUTOFF, ONE_EURO_BETA, ONE_EURO_D_CUTOFF,
+    SAVGOL_WINDOW, SAVGOL_ORDER, SWING_SPEED_FRACTION, PHASE_MOTION_FRACTION, IMPACT_WINDOW,
+    MIN_SWING_SPEED,
+)
+
+_L = PoseLandmark
+
+# Landmarks tracked through the swing; the right wrist drives swing detection,
+# as in assess_injury_risk.
+KINEMATIC_POINTS = {
+    "left_wrist": _L.LEFT_WRIST,
+    "right_wrist": _L.RIGHT_WRIST,
+    "left_hip": _L.LEFT_HIP,
+    "right_hip": _L.RIGHT_HIP,
+    "left_shoulder": _L.LEFT_SHOULDER,
+    "right_shoulder": _L.RIGHT_SHOULDER,
+}
+SWING_POINT = "right_wrist"
+PHASES = ("stance", "backlift", "downswing", "impact", "follow_through")
+
+
+def interpolate_missing(positions, times, detected):
+    """Fill undetected frames by linear interpolation in time; ends hold the nearest detection."""
+    if detected.all():
+        return positions
+    filled = positions.copy()
+    flat = filled.reshape(len(filled), -1)
+    for channel in range(flat.shape[1]):
+        flat[~detected, channel] = np.interp(times[~detected], times[detected], flat[detected, channel])
+    return filled
+
+
+def one_euro(positions, times, min_cutoff=ONE_EURO_MIN_CUTOFF, beta=ONE_EURO_BETA, d_cutoff=ONE_EURO_D_CUTOFF):
+    """One-Euro filter along axis 0, vectorised over the remaining axes.
+
+    Handles uneven time steps, so adaptively sampled clips filter correctly.
+    """
+    def alpha(dt, cutoff):
+        return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+
+    smoothed = np.empty_like(positions)
+    smoothed[0] = positions[0]
+    derivative = np.zeros_like(positions[0])
+    for i in range(1, len(positions)):
+        dt = max(times[i] - times[i - 1], 1e-6)
+        raw_derivative = (positions[i] - smoothed[i - 1]) / dt
+        derivative += alpha(dt, d_cutoff) * (raw_derivative - derivative)
+        a = alpha(dt, min_cutoff + beta * np.abs(derivative))
+        smoothed[i] = smoothed[i - 1] + a * (positions[i] - smoothed[i - 1])
+    return smoothed
+
+
+def savgol(positions, window=SAVGOL_WINDOW, order=SAVGOL_ORDER):
+    """Savitzky-Golay smoothing along axis 0, treating samples as evenly spaced."""
+    window = min(window, len(positions) - (len(positions) + 1) % 2)
+    if window <= order:
+        return positions
+    half = window // 2
+    vandermonde = np.vander(np.arange(-half, half + 1), order + 1, increasing=True)
+    coefficients = np.linalg.pinv(vandermonde)[0]
+    padded = np.pad(positions, [(half, half)] + [(0, 0)] * (positions.ndim - 1), mode="edge")
+    return sliding_window_view(padded, window, axis=0) @ coefficients
+
+
+SMOOTHERS = {
+    "one_euro": lambda positions, times: one_euro(positions, times),
+    "savgol": lambda positions, times: savgol(positions),
+    None: lambda positions, times: positions,
+}
+
+
+def compute_kinematics(landmarks, frame_indices, frame_rate, frame_size, smoothing=KINEMATICS_FILTER):
+    """Smoothed positions, velocity, speed and acceleration for KINEMATIC_POINTS in one pass.
+
+    `landmarks` is the (frames, 33, 4) array from the analysis. Positions are in
+    pixels and derivatives per second, like swing_speed. Returns None when fewer
+    than two frames have a pose. These smoothed series feed the swing timelines
+    and phases only; per-frame risk still uses assess_landmarks' raw swing speed,
+    so it stays identical to assess_injury_risk.
+    """
+    landmarks = np.asarray(landmarks)
+    frame_indices = np.asarray(frame_indices)
+    xy = landmarks[:, list(KINEMATIC_POINTS.values()), :2].astype(np.float64) * frame_size
+    detected = ~np.isnan(xy).any(axis=(1, 2))
+    if detected.sum() < 2:
+        return None
+
+    times = frame_indices / (frame_rate or 1.0)
+    positions = SMOOTHERS[smoothing](interpolate_missing(xy, times, detected), times)
+    velocity = np.gradient(positions, times, axis=0)
+    acceleration = np.gradient(velocity, times, axis=0)
+
+    points = {}
+    for column, name in enumerate(KINEMATIC_POINTS):
+        points[name] = {
+            "position": positions[:, column],
+            "velocity": velocity[:, column],
+            "speed": np.linalg.norm(velocity[:, column], axis=-1),
+            "acceleration": np.linalg.norm(acceleration[:, column], axis=-1),
+        }
+    return {"frame": frame_indices, "time": times, "interpolated": ~detected, "points": points}
+
+
+def swing_summary(kinematics, fraction=SWING_SPEED_FRACTION, swing_index=None):
+    """Summarise the swing around the peak SWING_POINT speed.
+
+    The swing window spans the frames around the peak where that speed stays
+    above `fraction` of it. Per point, reports the peak speed and its frame
+    within the window; the order of those peaks is the kinematic sequence
+    (hips, then shoulders, then hands in a well-timed stroke). The phases are
+    those of `swing_index` (segment_phases), so there is one segmentation.
+    """
+    frames = kinematics["frame"]
+    speed = kinematics["points"][SWING_POINT]["speed"]
+    peak = int(np.argmax(speed))
+    fast = speed >= fraction * speed[peak]
+    start = peak
+    while start > 0 and fast[start - 1]:
+        start -= 1
+    end = peak
+    while end < len(speed) - 1 and fast[end + 1]:
+        end += 1
+
+    def span(first, last):
+        return {
+            "start_frame": int(frames[first]),
+            "end_frame": int(frames[last]),
+            "duration": float(kinematics["time"][last] - kinematics["time"][first]),
+        }
+
+    window = slice(start, end + 1)
+    peaks = {}
+    for name, point in kinematics["points"].items():
+        row = start + int(np.argmax(point["speed"][window]))
+        peaks[name] = {
+            "peak_speed": float(point["speed"][row]),
+            "peak_frame": int(frames[row]),
+            "peak_acceleration": float(point["acceleration"][window].max()),
+        }
+    if swing_index is None:
+        swing_index = segment_phases(kinematics)
+    return {
+        "window": span(start, end),
+        "peak_frame": int(frames[peak]),
+        "peak_speed": float(speed[peak]),
+        "phases": swing_index["phases"],
+        "points": peaks,
+        "kinematic_sequence": sorted(peaks, key=lambda name: peaks[name]["peak_frame"]),
+    }
+
+
+def segment_phases(kinematics, motion_fraction=PHASE_MOTION_FRACTION, impact_window=IMPACT_WINDOW,
+                   min_speed=MIN_SWING_SPEED):
+    """Split the timeline into PHASES and pick out keyframes, from SWING_POINT alone.
+    
+    Impact is the peak wrist speed. The top of the backlift is the highest
+    wrist position before impact; the backlift starts after the last still
+    frame before that, and the finish is the first still frame after impact.
+    Impact covers `impact_window` seconds either side of the peak, but at
+    least one frame each side, and never reaches back to the top, so a
+    downswing exists whenever the top comes before impact.
+    Returns a compact index: per phase its first and last frame (None if the
+    clip has no such phase), and the keyframe frame numbers. When the wrist
+    never reaches `min_speed` (pixels/second) there is no swing: every phase
+    is None and there are no keyframes.
+    """
+    frames = kinematics["frame"]
+    times = kinematics["time"]
+    point = kinematics["points"][SWING_POINT]
+    speed = point["speed"]
+    impact = int(np.argmax(speed))
+    if speed[impact] < min_speed:
+        return {"phases": dict.fromkeys(PHASES), "keyframes": {}}
+    # Image y grows downwards, so the highest wrist position is the smallest y.
+    top = int(np.argmin(point["position"][:impact + 1, 1]))
+    still = speed < motion_fraction * speed[impact]
+    before = np.flatnonzero(still[:top])
+    backlift = int(before[-1]) + 1 if len(before) else 0
+    after = np.flatnonzero(still[impact:])
+    finish = impact + int(after[0]) if len(after) else len(speed) - 1
+    near_impact = np.flatnonzero(np.abs(times - times[impact]) <= impact_window)
+    impact_start = max(0, min(int(near_impact[0]), impact - 1))
+    impact_end = min(len(speed) - 1, max(int(near_impact[-1]), impact + 1))
+    if top < impact:
+        impact_start = max(impact_start, top + 1)
+    
+    # Phase boundaries as rows; clamped so overlapping ones leave a phase empty.
+    bounds = np.maximum.accumulate([0, backlift, top, impact_start, impact_end + 1, len(speed)])
+    phases = {}
+    for name, first, stop in zip(PHASES, bounds[:-1], bounds[1:]):
+        phases[name] = {"start_frame": int(frames[first]), "end_frame": int(frames[stop - 1])} if stop > first else None
+    return {
+        "phases": phases,
+        "keyframes": {
+            "address": int(frames[0]),
+            "backlift_start": int(frames[backlift]),
+            "top_of_backlift": int(frames[top]),
+            "impact": int(frames[impact]),
+            "finish": int(frames[finish]),
+        },
+    }
+
+
+def kinematics_summary(kinematics, swing_index=None):
+    """JSON-ready swing summary plus per-frame speed and acceleration timelines."""
+    return {
+        "swing": swing_summary(kinematics, swing_index=swing_index),
+        "timelines": {
+            "frame": kinematics["frame"].tolist(),
+            "interpolated": kinematics["interpolated"].tolist(),
+            **{
+                name: {
+                    "speed": np.round(point["speed"], 2).tolist(),
+                    "acceleration": np.round(point["acceleration"], 2).tolist(),
+                }
+                for name, point in kinematics["points"].items()
+            },
+        },
+    }
@@ -0,0 +1,122 @@
+import contextvars
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage-duration histogram buckets
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_stages = {}
+_gauges = {}
+_gauge_peaks = {}
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Per-request stage totals; filled from every thread that runs in the request's context."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            count, total, longest = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    def to_dict(self):
+        with self._lock:
+            stages = {
+                stage: {"count": count, "total_ms": round(total * 1000, 3), "max_ms": round(longest * 1000, 3)}
+                for stage, (count, total, longest) in self._stages.items()
+            }
+        return {"wall_ms": round((time.perf_counter() - self.started) * 1000, 3), "stages": stages}
+
+
+def observe(stage, seconds):
+    """Record one `stage` duration in the process-wide histogram and the current trace, if any."""
+    with _lock:
+        histogram = _stages.get(stage)
+        if histogram is None:
+            histogram = _stages[stage] = {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def set_queue_depth(queue_name, depth):
+    """Record a queue's current depth and keep its high-water mark."""
+    with _lock:
+        _gauges[queue_name] = depth
+        _gauge_peaks[queue_name] = max(_gauge_peaks.get(queue_name, 0), depth)
+
+
+@contextmanager
+def trace_request():
+    """Collect stage timings for everything run in this context; yields the Trace."""
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def render(extra_gauges=None):
+    """All metrics in the Prometheus text exposition format.
+
+    `extra_gauges` maps metric names to values sampled at scrape time.
+    """
+    lines = [
+        "# HELP bharatshot_stage_seconds Time spent per analysis stage.",
+        "# TYPE bharatshot_stage_seconds histogram",
+    ]
+    with _lock:
+        for stage, histogram in sorted(_stages.items()):
+            for bound, count in zip(STAGE_BUCKETS, histogram["buckets"]):
+                lines.append(f'bharatshot_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'bharatshot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'bharatshot_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+            lines.append(f'bharatshot_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+        gauges = dict(_gauges)
+        peaks = dict(_gauge_peaks)
+
+    lines += ["# HELP bharatshot_queue_depth Items waiting in a pipeline queue.", "# TYPE bharatshot_queue_depth gauge"]
+    lines += [f'bharatshot_queue_depth{{queue="{name}"}} {depth}' for name, depth in sorted(gauges.items())]
+    lines += ["# HELP bharatshot_queue_depth_max High-water mark of a pipeline queue.", "# TYPE bharatshot_queue_depth_max gauge"]
+    lines += [f'bharatshot_queue_depth_max{{queue="{name}"}} {depth}' for name, depth in sorted(peaks.items())]
+
+    # ru_maxrss is in kilobytes on Linux.
+    memory = {"bharatshot_max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    rss = _current_rss_bytes()
+    if rss is not None:
+        memory["bharatshot_rss_bytes"] = rss
+    for name, value in {**memory, **(extra_gauges or {})}.items():
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,286 @@
+import contextvars
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from config import (
+    logger, new_pose, PIPELINE_QUEUE_SIZE,
+    VIDEO_CODECS, VIDEO_FRAGMENTED_MP4, FFMPEG_BINARY, ROI_TRACKING,
+)
+from roi import RoiTracker
+from metrics import timed, set_queue_depth
+
+_END = object()
+
+
+class _StageError:
+    """Wraps an exception raised inside a background stage."""
+    def __init__(self, error):
+        self.error = error
+
+
+def read_frames(cap, max_frames=None):
+    """Yield (frame_index, frame) pairs from an open capture."""
+    frame_index = 0
+    while cap.isOpened() and (max_frames is None or frame_index < max_frames):
+        with timed("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_index, frame
+        frame_index += 1
+
+
+def prefetch(iterable, maxsize=PIPELINE_QUEUE_SIZE, name="prefetch"):
+    """Run an iterable in a background thread, holding at most `maxsize` items.
+
+    The thread runs in a copy of the caller's context, so its stage timings land in the caller's trace.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                set_queue_depth(name, buffer.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except Exception as e:
+            _put(_StageError(e))
+            return
+        _put(_END)
+
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(_produce,), daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            set_queue_depth(name, buffer.qsize())
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+        set_queue_depth(name, 0)
+
+
+_idle_poses = queue.LifoQueue()
+
+
+@contextmanager
+def borrow_pose():
+    """Check out a Pose instance for one analysis.
+
+    MediaPipe graphs are not thread-safe, so concurrent requests each get their
+    own instance; idle ones are kept for reuse instead of being rebuilt.
+    """
+    try:
+        pose = _idle_poses.get_nowait()
+    except queue.Empty:
+        pose = new_pose()
+    try:
+        yield pose
+    finally:
+        _idle_poses.put(pose)
+
+
+def estimate_poses(frames, pose, known_results=None):
+    """Run pose estimation on each (frame_index, frame) pair, reusing any results in `known_results`.
+
+    With ROI_TRACKING on, frames after a detection are cropped around the batter (see roi.RoiTracker).
+    """
+    known_results = known_results or {}
+    tracker = RoiTracker(pose) if ROI_TRACKING else None
+    for frame_index, frame in frames:
+        if frame_index in known_results:
+            yield frame_index, frame, known_results.pop(frame_index)
+            continue
+        if tracker is not None:
+            results = tracker.process(frame_index, frame)
+        else:
+            with timed("color_convert"):
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with timed("pose_process"):
+                results = pose.process(frame_rgb)
+        yield frame_index, frame, results
+
+
+_video_codec = None
+_video_codec_lock = threading.Lock()
+
+
+def probe_video_codec():
+    """Return the first (fourcc, extension) in VIDEO_CODECS this OpenCV build can encode.
+
+    Probed once by writing a tiny clip; later calls return the cached choice.
+    """
+    global _video_codec
+    with _video_codec_lock:
+        if _video_codec is None:
+            with tempfile.TemporaryDirectory() as probe_dir:
+                for fourcc, extension in VIDEO_CODECS:
+                    probe_path = os.path.join(probe_dir, f"probe_{fourcc}{extension}")
+                    out = cv2.VideoWriter(probe_path, cv2.VideoWriter_fourcc(*fourcc), 10, (64, 64))
+                    opened = out.isOpened()
+                    if opened:
+                        out.write(np.zeros((64, 64, 3), dtype=np.uint8))
+                    out.release()
+                    if opened and os.path.exists(probe_path) and os.path.getsize(probe_path) > 0:
+                        _video_codec = (fourcc, extension)
+                        break
+                else:
+                    logger.error("No video codec in VIDEO_CODECS could be opened; falling back to MJPG")
+                    _video_codec = ("MJPG", ".avi")
+            logger.info(f"Output video codec: {_video_codec[0]} ({_video_codec[1]})")
+        return _video_codec
+
+
+class FFmpegPipeWriter:
+    """cv2.VideoWriter stand-in that pipes raw frames to ffmpeg as fragmented MP4.
+
+    Fragmented output has its index up front, so browsers can start playing it
+    while it is still being written and no second faststart pass is needed.
+    """
+
+    def __init__(self, binary, output_video_path, fps, frame_size):
+        width, height = frame_size
+        command = [
+            binary, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}", "-i", "-",
+            "-an", "-c:v", _ffmpeg_encoder(binary), "-pix_fmt", "yuv420p",
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            output_video_path,
+        ]
+        # stderr goes to a temporary file: a pipe nobody reads while frames are
+        # written could fill up on a long encode and deadlock ffmpeg.
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self._stderr)
+        except OSError as e:
+            logger.error(f"Could not start ffmpeg: {e}")
+            self._process = None
+            self._stderr.close()
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, frame):
+        self._process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def release(self):
+        if self._process is None:
+            return
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            self._stderr.seek(0)
+            # The tail holds the error that stopped it.
+            message = self._stderr.read()[-4096:].decode(errors="replace")
+            logger.error(f"ffmpeg exited with {self._process.returncode}: {message}")
+        self._stderr.close()
+        self._process = None
+
+
+_ffmpeg_encoders = {}
+
+
+def _ffmpeg_encoder(binary):
+    """H.264 when the ffmpeg build has libx264, MPEG-4 Part 2 otherwise."""
+    if binary not in _ffmpeg_encoders:
+        listing = subprocess.run([binary, "-hide_banner", "-encoders"], capture_output=True, text=True).stdout
+        _ffmpeg_encoders[binary] = "libx264" if "libx264" in listing else "mpeg4"
+    return _ffmpeg_encoders[binary]
+
+
+def open_video_writer(output_video_path, fps, frame_size):
+    """Open a writer for the probed codec; the returned path carries that codec's extension.
+
+    With VIDEO_FRAGMENTED_MP4 set and ffmpeg on PATH, writes fragmented MP4 through ffmpeg instead.
+    """
+    root, _ = os.path.splitext(output_video_path)
+    if VIDEO_FRAGMENTED_MP4:
+        binary = shutil.which(FFMPEG_BINARY)
+        if binary:
+            return FFmpegPipeWriter(binary, root + ".mp4", fps, frame_size), root + ".mp4"
+        logger.warning(f"VIDEO_FRAGMENTED_MP4 is set but {FFMPEG_BINARY} was not found; using OpenCV")
+    fourcc, extension = probe_video_codec()
+    output_video_path = root + extension
+    out = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*fourcc), fps, frame_size)
+    return out, output_video_path
+
+
+class StreamingVideoWriter:
+    """Encodes frames on a dedicated thread fed by a bounded queue.
+
+    The writer is opened on the first frame. Encoding overlaps with pose
+    inference and annotation; write() only blocks when the encoder is
+    PIPELINE_QUEUE_SIZE frames behind.
+    """
+
+    def __init__(self, output_video_path, fps, maxsize=PIPELINE_QUEUE_SIZE):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.frames_written = 0
+        self._out = None
+        self._frames = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._error = None
+
+    def write(self, frame):
+        """Queue one frame for encoding. Returns False if the writer could not be opened or has failed."""
+        if self._out is None:
+            height, width = frame.shape[:2]
+            self._out, self.output_video_path = open_video_writer(self.output_video_path, self.fps, (width, height))
+            if not self._out.isOpened():
+                logger.error("Failed to create video writer")
+                return False
+            self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._encode,), daemon=True)
+            self._thread.start()
+        if self._error is not None:
+            logger.error(f"Video encoding failed: {self._error}")
+            return False
+        self._frames.put(frame)
+        set_queue_depth("writer", self._frames.qsize())
+        self.frames_written += 1
+        return True
+
+    def _encode(self):
+        while True:
+            frame = self._frames.get()
+            set_queue_depth("writer", self._frames.qsize())
+            if frame is _END:
+                return
+            if self._error is None:
+                try:
+                    with timed("encode"):
+                        self._out.write(frame)
+                except Exception as e:
+                    # Keep draining so write() never blocks on a dead encoder.
+                    self._error = e
+
+    def close(self):
+        """Flush queued frames and release the writer."""
+        if self._thread is not None:
+            self._frames.put(_END)
+            self._thread.join()
+            self._thread = None
+        if self._out is not None:
+            self._out.release()
+            self._out = None
@@ -0,0 +1,100 @@
+import math
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from config import logger, get_mp_pose, POSE_OPTIONS, POSE_CHUNK_SIZE, POSE_CHUNK_OVERLAP
+from pipeline import estimate_poses
+from sampling import read_sampled_frames
+
+# Same shape as the MediaPipe result object, as far as the pipeline is concerned.
+PoseResult = namedtuple("PoseResult", ["pose_landmarks"])
+
+_worker_pose = None
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _init_worker(pose_options):
+    """Give each worker process its own MediaPipe Pose instance."""
+    global _worker_pose
+    _worker_pose = get_mp_pose().Pose(**pose_options)
+
+
+def _infer_chunk(video_path, frame_indices, overlap):
+    """Run pose estimation over one chunk, dropping the leading overlap frames."""
+    # The worker's tracker last saw some other chunk; start this one from scratch
+    # so only its own overlap frames seed tracking, whichever worker runs it.
+    _worker_pose.reset()
+    cap = cv2.VideoCapture(video_path)
+    chunk = []
+    try:
+        poses = estimate_poses(read_sampled_frames(cap, frame_indices), _worker_pose)
+        for position, (frame_index, _, results) in enumerate(poses):
+            if position < overlap:
+                continue
+            landmarks = results.pose_landmarks.SerializeToString() if results.pose_landmarks else None
+            chunk.append((frame_index, landmarks))
+    finally:
+        cap.release()
+    return chunk
+
+
+def get_pose_pool(workers):
+    """Return a shared process pool with `workers` pre-initialised pose workers."""
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(POSE_OPTIONS,)
+            )
+        return _pools[workers]
+
+
+def _ready():
+    return _worker_pose is not None
+
+
+def warm_pose_pool(workers):
+    """Start every worker of the pool and load its pose model ahead of the first clip."""
+    pool = get_pose_pool(workers)
+    return all(f.result() for f in [pool.submit(_ready) for _ in range(workers * 2)])
+
+
+def split_chunks(frame_indices, chunk_size=POSE_CHUNK_SIZE, overlap=POSE_CHUNK_OVERLAP):
+    """Split ascending frame indices into (indices, overlap) chunks; each chunk is prefixed
+    with up to `overlap` frames from the previous one to re-seed tracking."""
+    chunks = []
+    for start in range(0, len(frame_indices), chunk_size):
+        lead = min(overlap, start)
+        chunks.append((frame_indices[start - lead:start + chunk_size], lead))
+    return chunks
+
+
+def infer_poses_parallel(video_path, frame_indices, workers, chunk_size=POSE_CHUNK_SIZE, overlap=POSE_CHUNK_OVERLAP):
+    """Estimate poses for `frame_indices` across a process pool.
+
+    Chunks hold at most `chunk_size` frames but are cut smaller when there are
+    too few frames to give every worker one. Returns a dict mapping frame
+    index to a PoseResult, merged back in frame order.
+    """
+    frame_indices = sorted(frame_indices)
+    if not frame_indices:
+        return {}
+    chunk_size = max(1, min(chunk_size, math.ceil(len(frame_indices) / workers)))
+    chunks = split_chunks(frame_indices, chunk_size, overlap)
+    logger.debug(f"Pose pool: {len(frame_indices)} frames in {len(chunks)} chunks across {workers} workers")
+
+    from mediapipe.framework.formats import landmark_pb2
+
+    pool = get_pose_pool(workers)
+    futures = [pool.submit(_infer_chunk, video_path, indices, lead) for indices, lead in chunks]
+    results = {}
+    for future in futures:
+        for frame_index, landmarks in future.result():
+            pose_landmarks = landmark_pb2.NormalizedLandmarkList.FromString(landmarks) if landmarks else None
+            results[frame_index] = PoseResult(pose_landmarks)
+    return results
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from config import (logger, POSE_OPTIONS, ANALYSIS_FRAME_BUDGET, COARSE_BUDGET_FRACTION, SWING_SPIKE_FACTOR,
+                    ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_MAX_BYTES, ANALYSIS_CACHE_MAX_AGE, HASH_MEMO_SIZE,
+                    KINEMATICS_FILTER, ONE_EURO_MIN_CUTOFF, ONE_EURO_BETA, ONE_EURO_D_CUTOFF, SAVGOL_WINDOW, SAVGOL_ORDER,
+                    SWING_SPEED_FRACTION, ROI_TRACKING, ROI_MARGIN, ROI_INPUT_SIZE, ROI_MAX_GAP, PHASE_MOTION_FRACTION, IMPACT_WINDOW,
+                    MIN_SWING_SPEED)
+from frame_table import FrameTable
+
+# Bump when a change to the analysis would alter cached results.
+CACHE_VERSION = 6
+
+# (path, size, mtime) -> content hash, least recently used first
+_hash_memo = OrderedDict()
+_memo_lock = threading.Lock()
+_lock = threading.Lock()
+
+
+def _memo_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def _remember(memo_key, content_hash):
+    with _memo_lock:
+        _hash_memo[memo_key] = content_hash
+        _hash_memo.move_to_end(memo_key)
+        while len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+
+
+def known_hash(path):
+    """The memoised content hash of `path`, or None if it would have to be computed."""
+    memo_key = _memo_key(path)
+    with _memo_lock:
+        content_hash = _hash_memo.get(memo_key)
+        if content_hash is not None:
+            _hash_memo.move_to_end(memo_key)
+        return content_hash
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, memoised on (path, size, mtime)."""
+    content_hash = known_hash(path)
+    if content_hash is not None:
+        return content_hash
+    memo_key = _memo_key(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    _remember(memo_key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def remember_hash(path, content_hash):
+    """Record a hash computed elsewhere (e.g. while uploading) so hash_file need not re-read `path`."""
+    _remember(_memo_key(path), content_hash)
+
+
+def analysis_params():
+    """Parameters that change analysis output and so belong in the cache key."""
+    return {
+        "version": CACHE_VERSION,
+        "pose": POSE_OPTIONS,
+        "roi": (ROI_TRACKING, ROI_MARGIN, ROI_INPUT_SIZE, ROI_MAX_GAP),
+        "frame_budget": ANALYSIS_FRAME_BUDGET,
+        "coarse_fraction": COARSE_BUDGET_FRACTION,
+        "spike_factor": SWING_SPIKE_FACTOR,
+        "kinematics": (KINEMATICS_FILTER, ONE_EURO_MIN_CUTOFF, ONE_EURO_BETA, ONE_EURO_D_CUTOFF, SAVGOL_WINDOW, SAVGOL_ORDER, SWING_SPEED_FRACTION),
+        "phases": (PHASE_MOTION_FRACTION, IMPACT_WINDOW, MIN_SWING_SPEED),
+    }
+
+
+def cache_key(video_hash, params=None):
+    """Combine a video content hash with the analysis parameters."""
+    encoded = json.dumps(params if params is not None else analysis_params(), sort_keys=True)
+    return hashlib.sha256(f"{video_hash}:{encoded}".encode()).hexdigest()
+
+
+def _entry_dir(key):
+    return os.path.join(ANALYSIS_CACHE_DIR, key)
+
+
+def load(key):
+    """Return (results, landmarks) for a cached analysis, or None on a miss.
+
+    The entry's output video may be missing: analysis-only runs never write
+    one, and older videos may have been removed. Callers that need the video
+    re-render it from the stored landmarks.
+    """
+    entry = _entry_dir(key)
+    try:
+        with open(os.path.join(entry, "result.json")) as f:
+            results = json.load(f)
+        results["frame_table"] = FrameTable.load_npz(os.path.join(entry, "frame_table.npz"))
+        with np.load(os.path.join(entry, "landmarks.npz")) as arrays:
+            landmarks = arrays["landmarks"]
+        os.utime(entry)
+    except (OSError, ValueError, KeyError):
+        return None
+    logger.debug(f"Analysis cache hit: {key}")
+    return results, landmarks
+
+
+def store(key, results, landmarks):
+    """Persist an analysis atomically, then evict old entries."""
+    os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+    staging = os.path.join(ANALYSIS_CACHE_DIR, f".tmp_{uuid.uuid4()}")
+    os.makedirs(staging)
+    try:
+        with open(os.path.join(staging, "result.json"), "w") as f:
+            json.dump({k: v for k, v in results.items() if k != "frame_table"}, f)
+        results["frame_table"].save_npz(os.path.join(staging, "frame_table.npz"))
+        np.savez_compressed(os.path.join(staging, "landmarks.npz"), landmarks=landmarks)
+        with _lock:
+            entry = _entry_dir(key)
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.replace(staging, entry)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    evict()
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def evict(max_bytes=ANALYSIS_CACHE_MAX_BYTES, max_age=ANALYSIS_CACHE_MAX_AGE):
+    """Drop entries older than `max_age`, then least recently used ones until under `max_bytes`."""
+    with _lock:
+        if not os.path.isdir(ANALYSIS_CACHE_DIR):
+            return
+        entries = []
+        for name in os.listdir(ANALYSIS_CACHE_DIR):
+            path = os.path.join(ANALYSIS_CACHE_DIR, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for last_used, size, path in entries:
+            if now - last_used <= max_age and total <= max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.debug(f"Evicted analysis cache entry {os.path.basename(path)}")
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+from config import ROI_MARGIN, ROI_INPUT_SIZE, ROI_MAX_GAP
+from metrics import timed
+
+
+class RoiTracker:
+    """Runs pose estimation on a crop around the last detection instead of the full frame.
+
+    The crop is the previous landmarks' bounding box plus ROI_MARGIN per side,
+    downscaled so its longer side is at most ROI_INPUT_SIZE, so colour
+    conversion and inference touch only that region. The box stays put while
+    the landmarks remain well inside it, which keeps MediaPipe's own tracking
+    stable. Landmarks are re-projected to full-frame coordinates. When the crop
+    finds no pose, or frames are more than ROI_MAX_GAP apart, the full frame is
+    used again.
+    """
+
+    def __init__(self, pose, margin=ROI_MARGIN, input_size=ROI_INPUT_SIZE, max_gap=ROI_MAX_GAP):
+        self.pose = pose
+        self.margin = margin
+        self.input_size = input_size
+        self.max_gap = max_gap
+        self.box = None
+        self._last_index = None
+
+    def process(self, frame_index, frame):
+        """Pose results for one BGR frame, with landmarks in full-frame coordinates."""
+        if self._last_index is not None and frame_index - self._last_index > self.max_gap:
+            self.box = None
+        self._last_index = frame_index
+
+        if self.box is not None:
+            results = self._process_crop(frame, self.box)
+            if results.pose_landmarks:
+                self._update_box(results.pose_landmarks, frame.shape)
+                return results
+            self.box = None
+
+        with timed("color_convert"):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with timed("pose_process"):
+            results = self.pose.process(frame_rgb)
+        if results.pose_landmarks:
+            self._update_box(results.pose_landmarks, frame.shape)
+        return results
+
+    def _process_crop(self, frame, box):
+        x0, y0, x1, y1 = box
+        crop = frame[y0:y1, x0:x1]
+        scale = self.input_size / max(x1 - x0, y1 - y0)
+        with timed("color_convert"):
+            if scale < 1:
+                crop = cv2.resize(crop, (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale))), interpolation=cv2.INTER_AREA)
+            crop_rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        with timed("pose_process"):
+            results = self.pose.process(crop_rgb)
+        if results.pose_landmarks:
+            height, width = frame.shape[:2]
+            crop_width, crop_height = x1 - x0, y1 - y0
+            for lm in results.pose_landmarks.landmark:
+                lm.x = (x0 + lm.x * crop_width) / width
+                lm.y = (y0 + lm.y * crop_height) / height
+                # MediaPipe scales z like x.
+                lm.z = lm.z * crop_width / width
+        return results
+
+    def _update_box(self, pose_landmarks, frame_shape):
+        height, width = frame_shape[:2]
+        points = np.array([(lm.x * width, lm.y * height) for lm in pose_landmarks.landmark])
+        (px0, py0), (px1, py1) = points.min(axis=0), points.max(axis=0)
+        if self.box is not None:
+            x0, y0, x1, y1 = self.box
+            # Keep the box while the pose stays inside its inner half-margin.
+            inset_x = (x1 - x0) * self.margin / (2 * (1 + 2 * self.margin))
+            inset_y = (y1 - y0) * self.margin / (2 * (1 + 2 * self.margin))
+            if px0 >= x0 + inset_x and py0 >= y0 + inset_y and px1 <= x1 - inset_x and py1 <= y1 - inset_y:
+                return
+        pad_x = (px1 - px0) * self.margin
+        pad_y = (py1 - py0) * self.margin
+        box = (
+            int(max(0, px0 - pad_x)),
+            int(max(0, py0 - pad_y)),
+            int(min(width, np.ceil(px1 + pad_x))),
+            int(min(height, np.ceil(py1 + pad_y))),
+        )
+        # A degenerate box cannot be cropped; fall back to the full frame next time.
+        self.box = box if box[2] - box[0] > 1 and box[3] - box[1] > 1 else None
@@ -0,0 +1,112 @@
+import math
+import cv2
+import numpy as np
+from config import (logger, PoseLandmark, ANALYSIS_FRAME_BUDGET, COARSE_BUDGET_FRACTION,
+                    SWING_SPIKE_FACTOR, SEEK_THRESHOLD)
+from pipeline import estimate_poses
+from metrics import timed
+
+
+def read_sampled_frames(cap, frame_indices, seek_threshold=SEEK_THRESHOLD):
+    """Yield (frame_index, frame) for ascending indices, grabbing across short gaps and seeking across long ones."""
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    for target in frame_indices:
+        with timed("decode"):
+            gap = target - position
+            if gap < 0 or gap > seek_threshold:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+            else:
+                while position < target:
+                    if not cap.grab():
+                        return
+                    position += 1
+            ret, frame = cap.read()
+        if not ret:
+            return
+        position += 1
+        yield target, frame
+
+
+def read_frame_at(cap, frame_index):
+    """Seek straight to one frame and decode it; None past the end of the clip."""
+    with timed("decode"):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        ret, frame = cap.read()
+    return frame if ret else None
+
+
+def _wrist_speeds(coarse_results, frame_size):
+    """Right-wrist speed (pixels/frame) between consecutive coarse samples that both have a pose."""
+    width, height = frame_size
+    detected = [(i, r.pose_landmarks.landmark[PoseLandmark.RIGHT_WRIST])
+                for i, r in sorted(coarse_results.items()) if r.pose_landmarks]
+    intervals = []
+    for (i0, w0), (i1, w1) in zip(detected, detected[1:]):
+        dist = np.linalg.norm([(w1.x - w0.x) * width, (w1.y - w0.y) * height])
+        intervals.append((dist / (i1 - i0), i0, i1))
+    return intervals
+
+
+def _swing_windows(intervals, stride, total_frames, budget):
+    """Pick dense windows around the fastest wrist intervals until the budget is spent."""
+    if not intervals:
+        return []
+    threshold = np.median([speed for speed, _, _ in intervals]) * SWING_SPIKE_FACTOR
+    windows = []
+    for speed, start, end in sorted(intervals, reverse=True):
+        if budget <= 0 or speed <= threshold:
+            break
+        lo = max(0, start - stride)
+        hi = min(total_frames - 1, end + stride)
+        if any(lo <= w_hi and hi >= w_lo for w_lo, w_hi in windows):
+            continue
+        if hi - lo + 1 > budget:
+            centre = (start + end) // 2
+            lo = max(0, centre - budget // 2)
+            hi = min(total_frames - 1, lo + budget - 1)
+        windows.append((lo, hi))
+        budget -= hi - lo + 1
+    return windows
+
+
+def plan_frame_samples(cap, pose, budget=ANALYSIS_FRAME_BUDGET, infer=None):
+    """Choose which frames to analyse so the whole clip is covered within `budget` pose inferences.
+
+    The coarse pass runs on `pose` in this thread, or through `infer(frame_indices)`
+    (returning a dict of frame index to pose result, e.g. the process pool) when given.
+    Returns (frame_indices, coarse_results), where coarse_results maps frame
+    index to the pose result already computed during the coarse pass. Returns
+    (None, {}) when the clip is short enough, or its length unknown, to be read
+    in full.
+    """
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames <= budget:
+        return None, {}
+
+    coarse_budget = max(2, int(budget * COARSE_BUDGET_FRACTION))
+    stride = math.ceil(total_frames / coarse_budget)
+    coarse_indices = list(range(0, total_frames, stride))
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    if infer is not None:
+        coarse_results = infer(coarse_indices)
+    else:
+        coarse_results = {
+            frame_index: results
+            for frame_index, _, results in estimate_poses(read_sampled_frames(cap, coarse_indices), pose)
+        }
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    dense_budget = budget - len(coarse_results)
+    windows = _swing_windows(_wrist_speeds(coarse_results, frame_size), stride, total_frames, dense_budget)
+    selected = set(coarse_results)
+    if windows:
+        for lo, hi in windows:
+            selected.update(range(lo, hi + 1))
+    else:
+        # No swing found: spend the rest of the budget halving the coarse stride.
+        selected.update(i + stride // 2 for i in coarse_indices[:dense_budget] if i + stride // 2 < total_frames)
+
+    logger.debug(f"Sampling plan: {total_frames} frames, stride {stride}, swing windows {windows}, {len(selected)} frames selected")
+    return sorted(selected), coarse_results
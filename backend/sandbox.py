@@ -0,0 +1,165 @@
+import io
+import os
+import pickle
+import queue
+import resource
+import threading
+import traceback
+import uuid
+import multiprocessing
+from contextlib import redirect_stdout
+import numpy as np
+from config import logger, SANDBOX_WORKERS, SANDBOX_TIMEOUT, SANDBOX_CPU_SECONDS, SANDBOX_MEMORY_BYTES
+from image_store import attach_image, pil_view
+
+# Names every snippet starts with; they are not carried over as session variables.
+_BUILTIN_NAMES = {
+    "cv2", "np", "plt", "patches", "Image", "ImageDraw", "ImageFont",
+    "image", "pil_image", "image_path", "output_images", "analysis_data", "detection_results"
+}
+
+
+class SandboxError(Exception):
+    """Raised when a snippet times out or kills its worker."""
+
+
+def _worker_main(conn, memory_bytes):
+    """Worker loop: heavy imports once, then run snippets sent over `conn`."""
+    import cv2
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from PIL import Image, ImageDraw, ImageFont
+
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, hard))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        code, variables, image_ref, image_path, cpu_seconds = request
+
+        # CPU limit is cumulative for the process, so move it forward per call; SIGXCPU ends a runaway snippet.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+        stdout = io.StringIO()
+        try:
+            image = attach_image(image_ref)
+            namespace = dict(variables)
+            namespace.update({
+                "cv2": cv2,
+                "np": np,
+                "plt": plt,
+                "patches": patches,
+                "Image": Image,
+                "ImageDraw": ImageDraw,
+                "ImageFont": ImageFont,
+                "image": image,
+                # Only converted for snippets that use it.
+                "pil_image": pil_view(image) if "pil_image" in code else None,
+                "image_path": image_path,
+                "output_images": [],
+                "analysis_data": {},
+                "detection_results": []
+            })
+            with redirect_stdout(stdout):
+                exec(code, namespace)
+
+            saved_images = []
+            for img in namespace["output_images"]:
+                image_filename = os.path.join("static", "outputs", f"processed_{uuid.uuid4()}.png")
+                os.makedirs(os.path.dirname(image_filename), exist_ok=True)
+                if isinstance(img, np.ndarray):
+                    cv2.imwrite(image_filename, img)
+                    saved_images.append(image_filename)
+                elif isinstance(img, Image.Image):
+                    img.save(image_filename)
+                    saved_images.append(image_filename)
+
+            # Only picklable values can travel back to the session.
+            new_variables = {}
+            for name, value in namespace.items():
+                if name.startswith("__") or name in _BUILTIN_NAMES:
+                    continue
+                try:
+                    pickle.dumps(value)
+                except Exception:
+                    continue
+                new_variables[name] = value
+            plt.close("all")
+            conn.send(("ok", stdout.getvalue(), new_variables, saved_images))
+        except BaseException as e:
+            plt.close("all")
+            conn.send(("error", stdout.getvalue(), f"{type(e).__name__}: {e}", traceback.format_exc(limit=3)))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, SANDBOX_MEMORY_BYTES), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pre-warmed worker processes that run snippets with CPU, memory and wall-clock limits."""
+
+    def __init__(self, workers=SANDBOX_WORKERS):
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(_Worker(self._context))
+
+    def run(self, code, variables, image_ref, image_path, timeout=SANDBOX_TIMEOUT, cpu_seconds=SANDBOX_CPU_SECONDS):
+        """Run `code` against the shared-memory image `image_ref` in a worker.
+
+        Returns (stdout, new_variables, saved_image_paths). Errors raised by the
+        snippet come back as RuntimeError; a timeout or a dead worker raises
+        SandboxError and the worker is replaced.
+        """
+        worker = self._idle.get()
+        try:
+            worker.conn.send((code, variables, image_ref, image_path, cpu_seconds))
+            if not worker.conn.poll(timeout):
+                raise SandboxError(f"Code execution timed out after {timeout}s")
+            status, stdout, *payload = worker.conn.recv()
+        except (EOFError, OSError, SandboxError) as e:
+            worker.kill()
+            logger.error(f"Sandbox worker {worker.process.pid} replaced: {e}")
+            worker = _Worker(self._context)
+            if isinstance(e, SandboxError):
+                raise
+            raise SandboxError("Code execution was terminated (CPU or memory limit exceeded)") from e
+        finally:
+            self._idle.put(worker)
+
+        if status == "error":
+            message, trace = payload
+            logger.error(f"Sandboxed code failed: {trace}")
+            raise RuntimeError(message)
+        new_variables, saved_images = payload
+        return stdout, new_variables, saved_images
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool():
+    """Return the process-wide sandbox pool, starting its workers on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
@@ -0,0 +1,32 @@
+import threading
+import time
+from config import logger, SESSION_TTL
+
+
+class Session:
+    """Per-client state that must outlive a single request but never leak across clients."""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.variables = {}
+        self.analysis_results = {}
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(session_id):
+    """Return the session for `session_id`, creating it if needed and expiring idle ones."""
+    now = time.time()
+    with _sessions_lock:
+        for stale_id in [sid for sid, s in _sessions.items() if now - s.last_used > SESSION_TTL]:
+            del _sessions[stale_id]
+            logger.debug(f"Expired session {stale_id}")
+        session = _sessions.get(session_id)
+        if session is None:
+            session = _sessions[session_id] = Session(session_id)
+        session.last_used = now
+        return session
@@ -0,0 +1,250 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from config import logger, TEMPLATE_DIR, TEMPLATE_LENGTH, DTW_BAND, DTW_BATCH_SIZE, COMPARE_TOP_K
+from biomechanics import JOINT_ANGLES
+from kinematics import interpolate_missing
+from metrics import timed
+
+TEMPLATE_NAME = re.compile(r"^[\w-]{1,64}$")
+
+
+def swing_angles(results, length=TEMPLATE_LENGTH):
+    """The joint-angle series of an analysed swing, resampled to `length` rows.
+
+    Covers backlift start to finish from the swing_index when there is one,
+    otherwise the whole clip. Undetected frames are interpolated. Returns a
+    (length, JOINT_ANGLES) float64 array, or None with fewer than two detections.
+    """
+    table = results["frame_table"]
+    rows = slice(None)
+    keyframes = (results.get("swing_index") or {}).get("keyframes")
+    if keyframes:
+        rows = slice(table.row(keyframes["backlift_start"]), table.row(keyframes["finish"]) + 1)
+    frames = table.frame[rows].astype(np.float64)
+    detected = table.detected[rows]
+    if detected.sum() < 2:
+        return None
+    angles = interpolate_missing(table.angles[rows].astype(np.float64), frames, detected)
+    # Time-normalise: each swing becomes `length` evenly spaced samples from its first to last frame.
+    targets = np.linspace(frames[0], frames[-1], length)
+    return np.column_stack([np.interp(targets, frames, angles[:, column]) for column in range(angles.shape[1])])
+
+
+def envelopes(series, radius):
+    """Running max and min over +-radius rows of (..., length, joints) series, for LB_Keogh."""
+    padded = np.pad(series, [(0, 0)] * (series.ndim - 2) + [(radius, radius), (0, 0)], mode="edge")
+    windows = sliding_window_view(padded, 2 * radius + 1, axis=-2)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+
+def lb_keogh(query, upper, lower):
+    """LB_Keogh lower bound of the banded DTW distance from `query` to each template's envelope."""
+    above = np.clip(query - upper, 0, None)
+    below = np.clip(lower - query, 0, None)
+    return (above ** 2 + below ** 2).sum(axis=(-2, -1))
+
+
+def dtw_distances(query, templates, radius):
+    """Banded DTW distance from a (length, joints) query to each of (n, length, joints) templates.
+
+    The cost of aligning two rows is their squared angle difference summed over
+    joints. Cells are filled one anti-diagonal at a time, vectorised across the
+    diagonal and across templates.
+    """
+    n, length = templates.shape[:2]
+    cost = ((query[None, :, None, :] - templates[:, None, :, :]) ** 2).sum(axis=-1)
+    total = np.full((n, length + 1, length + 1), np.inf)
+    total[:, 0, 0] = 0
+    for diagonal in range(2, 2 * length + 1):
+        i = np.arange(max(1, diagonal - length), min(length, diagonal - 1) + 1)
+        j = diagonal - i
+        band = np.abs(i - j) <= radius
+        i, j = i[band], j[band]
+        if not len(i):
+            continue
+        best = np.minimum(np.minimum(total[:, i - 1, j - 1], total[:, i - 1, j]), total[:, i, j - 1])
+        total[:, i, j] = cost[:, i - 1, j - 1] + best
+    return total[:, length, length]
+
+
+def dtw_path(query, template, radius):
+    """Warping path of the banded DTW alignment of one template, as (query_row, template_row) pairs."""
+    length = len(query)
+    cost = ((query[:, None, :] - template[None, :, :]) ** 2).sum(axis=-1)
+    total = np.full((length + 1, length + 1), np.inf)
+    total[0, 0] = 0
+    for i in range(1, length + 1):
+        for j in range(max(1, i - radius), min(length, i + radius) + 1):
+            total[i, j] = cost[i - 1, j - 1] + min(total[i - 1, j - 1], total[i - 1, j], total[i, j - 1])
+    path = [(length - 1, length - 1)]
+    i, j = length, length
+    while (i, j) != (1, 1):
+        steps = [(i - 1, j - 1), (i - 1, j), (i, j - 1)]
+        i, j = min((step for step in steps if step[0] >= 1 and step[1] >= 1), key=lambda step: total[step])
+        path.append((i - 1, j - 1))
+    return path[::-1]
+
+
+def joint_deviations(query, template, path, frames=None):
+    """Per joint: mean and largest absolute angle difference along the warping path.
+
+    `frames`, the query's frame numbers per row, turns the row of the largest
+    difference into a frame number.
+    """
+    rows = np.array(path)
+    difference = np.abs(query[rows[:, 0]] - template[rows[:, 1]])
+    deviations = {}
+    for column, name in enumerate(JOINT_ANGLES):
+        worst = int(np.argmax(difference[:, column]))
+        query_row = int(rows[worst, 0])
+        deviations[name] = {
+            "mean_deviation": round(float(difference[:, column].mean()), 2),
+            "max_deviation": round(float(difference[worst, column]), 2),
+            "max_at": int(round(frames[query_row])) if frames is not None else query_row,
+            # Positive when the batter's angle is larger than the reference's at that point.
+            "direction": round(float(query[query_row, column] - template[rows[worst, 1], column]), 2),
+        }
+    return deviations
+
+
+class TemplateLibrary:
+    """Reference strokes loaded from TEMPLATE_DIR into one stacked array.
+
+    Each template is a .npz of its resampled angle series plus JSON metadata
+    (name, stroke, description). LB_Keogh envelopes are computed once at load.
+    """
+
+    def __init__(self, path=TEMPLATE_DIR, length=TEMPLATE_LENGTH, band=DTW_BAND):
+        self.path = path
+        self.length = length
+        self.radius = max(1, int(round(band * length)))
+        self.meta = []
+        series = []
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                # Dotfiles are save_template's staging files, possibly mid-write.
+                if name.startswith(".") or not name.endswith(".npz"):
+                    continue
+                try:
+                    with np.load(os.path.join(path, name)) as arrays:
+                        template = arrays["series"].astype(np.float64)
+                        meta = json.loads(str(arrays["meta"]))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Skipping unreadable template {name}: {e}")
+                    continue
+                if template.shape != (length, len(JOINT_ANGLES)):
+                    logger.error(f"Skipping template {name}: shape {template.shape}")
+                    continue
+                series.append(template)
+                self.meta.append(meta)
+        self.series = np.stack(series) if series else np.empty((0, length, len(JOINT_ANGLES)))
+        self.upper, self.lower = envelopes(self.series, self.radius)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def match(self, query, top_k=COMPARE_TOP_K, stroke=None, batch_size=DTW_BATCH_SIZE):
+        """The `top_k` nearest templates to a (length, joints) query as [(index, distance)], nearest first.
+
+        Templates are visited in LB_Keogh order and compared exactly a batch at
+        a time; the search stops once the next lower bound exceeds the current
+        k-th best distance. Returns (matches, number of exact DTW comparisons).
+        """
+        candidates = np.arange(len(self))
+        if stroke is not None:
+            candidates = np.array([i for i in candidates if self.meta[i].get("stroke") == stroke], dtype=int)
+        if not len(candidates):
+            return [], 0
+        bounds = lb_keogh(query, self.upper[candidates], self.lower[candidates])
+        order = np.argsort(bounds)
+        candidates, bounds = candidates[order], bounds[order]
+
+        best_index = np.empty(0, dtype=int)
+        best_distance = np.empty(0)
+        compared = 0
+        for start in range(0, len(candidates), batch_size):
+            if len(best_distance) >= top_k and bounds[start] > best_distance[top_k - 1]:
+                break
+            batch = candidates[start:start + batch_size]
+            distances = dtw_distances(query, self.series[batch], self.radius)
+            compared += len(batch)
+            best_index = np.concatenate([best_index, batch])
+            best_distance = np.concatenate([best_distance, distances])
+            keep = np.argsort(best_distance, kind="stable")[:top_k]
+            best_index, best_distance = best_index[keep], best_distance[keep]
+        return list(zip(best_index.tolist(), best_distance.tolist())), compared
+
+
+_library = None
+_library_key = None
+_library_lock = threading.Lock()
+
+
+def get_template_library():
+    """The template library, reloaded when TEMPLATE_DIR changes."""
+    global _library, _library_key
+    key = os.stat(TEMPLATE_DIR).st_mtime_ns if os.path.isdir(TEMPLATE_DIR) else None
+    with _library_lock:
+        if _library is None or key != _library_key:
+            _library = TemplateLibrary(TEMPLATE_DIR)
+            _library_key = key
+            logger.debug(f"Loaded {len(_library)} reference stroke templates")
+        return _library
+
+
+def save_template(name, results, stroke, description=""):
+    """Store an analysed swing as a reference template; returns its metadata."""
+    if not TEMPLATE_NAME.match(name):
+        raise ValueError("Template names may only contain letters, digits, '_' and '-'")
+    series = swing_angles(results)
+    if series is None:
+        raise ValueError("Not enough frames with a detected pose to build a template")
+    meta = {"name": name, "stroke": stroke, "description": description, "frame_rate": results.get("frame_rate")}
+    os.makedirs(TEMPLATE_DIR, exist_ok=True)
+    path = os.path.join(TEMPLATE_DIR, f"{name}.npz")
+    staging = os.path.join(TEMPLATE_DIR, f".{name}.npz.tmp")
+    # Written through a file object, since np.savez would add ".npz" to a path.
+    with open(staging, "wb") as f:
+        np.savez(f, series=series.astype(np.float32), meta=np.array(json.dumps(meta)))
+    os.replace(staging, path)
+    # Directory mtime may not change on a same-name replace; force a reload.
+    global _library
+    with _library_lock:
+        _library = None
+    return meta
+
+
+def compare_to_templates(results, top_k=COMPARE_TOP_K, stroke=None):
+    """Match an analysed swing against the template library.
+
+    Returns the nearest templates, each with its DTW distance and per-joint
+    deviations along the alignment, or None when the swing has too few poses.
+    """
+    query = swing_angles(results)
+    if query is None:
+        return None
+    library = get_template_library()
+    with timed("stroke_match"):
+        matches, compared = library.match(query, top_k=top_k, stroke=stroke)
+
+    table = results["frame_table"]
+    keyframes = (results.get("swing_index") or {}).get("keyframes")
+    first, last = (keyframes["backlift_start"], keyframes["finish"]) if keyframes else (table.frame[0], table.frame[-1])
+    frames = np.linspace(table.frame[table.row(first)], table.frame[table.row(last)], library.length)
+
+    rows = []
+    for index, distance in matches:
+        template = library.series[index]
+        path = dtw_path(query, template, library.radius)
+        rows.append({
+            **library.meta[index],
+            "distance": round(float(distance), 2),
+            # Root-mean-square angle difference per aligned step and joint, in degrees.
+            "rms_deviation": round(float(np.sqrt(distance / (len(path) * query.shape[1]))), 2),
+            "joints": joint_deviations(query, template, path, frames),
+        })
+    return {"templates": len(library), "compared": compared, "matches": rows}
@@ -1,17 +1,29 @@
 
 import cv2
 import numpy as np
-import mediapipe as mp
 from math import degrees
 import os
 import uuid
-from PIL import Image
-from io import StringIO
-import sys
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from langchain_core.tools import tool
-from config import logger, mp_pose, pose, mp_drawing, persistent_vars, analysis_cache
+from typing import Annotated
+from langchain_core.tools import tool, InjectedToolCallId
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt import InjectedState
+from langgraph.types import Command
+from config import logger, PoseLandmark, get_mp_pose, get_mp_drawing, POSE_WORKERS, ANNOTATE_BATCH_SIZE
+from pipeline import read_frames, prefetch, borrow_pose, estimate_poses, StreamingVideoWriter
+from sessions import get_session
+from sandbox import get_sandbox_pool
+from image_store import get_image_store
+from sampling import plan_frame_samples, read_sampled_frames, read_frame_at
+from pose_pool import infer_poses_parallel
+import result_cache
+from kinematics import compute_kinematics, kinematics_summary, segment_phases
+from biomechanics import JOINTS, RISK_LEVELS, landmarks_to_array, array_to_landmarks, assess_landmarks, frame_records
+from frame_table import FrameTable, keyframe_metrics
+from metrics import timed
+
+# operation_type for video_pose_estimation_tool that skips drawing and encoding.
+ANALYSIS_ONLY = "analysis_only"
 
 # angle calculation using 3 landmarks jo zyda use hore h frame mai 
 def calculate_angle(p1, p2, p3):
@@ -42,12 +54,12 @@ def assess_injury_risk(landmarks, frame_rate, bat_positions):
     analysis = {}
     
     try:
-        left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-        left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP]
-        left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE]
-        right_knee = landmarks[mp_pose.PoseLandmark.RIGHT_KNEE]
+        left_shoulder = landmarks[PoseLandmark.LEFT_SHOULDER]
+        right_shoulder = landmarks[PoseLandmark.RIGHT_SHOULDER]
+        left_hip = landmarks[PoseLandmark.LEFT_HIP]
+        right_hip = landmarks[PoseLandmark.RIGHT_HIP]
+        left_knee = landmarks[PoseLandmark.LEFT_KNEE]
+        right_knee = landmarks[PoseLandmark.RIGHT_KNEE]
         spine_mid = [(left_hip.x + right_hip.x) / 2, (left_hip.y + right_hip.y) / 2]
         
         spine_angle = calculate_angle(
@@ -67,7 +79,7 @@ def assess_injury_risk(landmarks, frame_rate, bat_positions):
         left_knee_angle = calculate_angle(
             [left_hip.x, left_hip.y],
             [left_knee.x, left_knee.y],
-            [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE].x, landmarks[mp_pose.PoseLandmark.LEFT_ANKLE].y]
+            [landmarks[PoseLandmark.LEFT_ANKLE].x, landmarks[PoseLandmark.LEFT_ANKLE].y]
         )
         if left_knee_angle < 120:
             injury_risk["knees"] = "High"
@@ -81,7 +93,7 @@ def assess_injury_risk(landmarks, frame_rate, bat_positions):
         shoulder_angle = calculate_angle(
             [left_hip.x, left_hip.y],
             [left_shoulder.x, left_shoulder.y],
-            [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW].x, landmarks[mp_pose.PoseLandmark.LEFT_ELBOW].y]
+            [landmarks[PoseLandmark.LEFT_ELBOW].x, landmarks[PoseLandmark.LEFT_ELBOW].y]
         )
         if shoulder_angle > 90:
             injury_risk["shoulders"] = "High"
@@ -132,230 +144,412 @@ def suggest_exercises(injury_risk):
         })
     return exercises
 
-@tool
-def video_pose_estimation_tool(video_path: str, operation_type: str = "pose_estimation") -> str:
-    """Process video for pose estimation and biomechanical analysis."""
+def draw_overlay(frame, pose_landmarks, injury_risk, frame_index):
+    """Draw the skeleton, per-joint risk and frame number onto a frame in place."""
+    mp_drawing = get_mp_drawing()
+    mp_drawing.draw_landmarks(
+        frame,
+        pose_landmarks,  
+        get_mp_pose().POSE_CONNECTIONS,
+        mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
+        mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2)
+    )
+    
+    y_offset = 30
+    for joint, risk in injury_risk.items():
+        color = (0, 0, 255) if risk == "High" else (255, 165, 0) if risk == "Moderate" else (0, 255, 0)
+        cv2.putText(
+            frame,
+            f"{joint.capitalize()}: {risk}",
+            (10, y_offset),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            color,
+            2
+        )
+        y_offset += 30
+    
+    cv2.putText(
+        frame,
+        f"Frame: {frame_index}",
+        (10, frame.shape[0] - 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.7,
+        (255, 255, 255),
+        2
+    )
+
+def annotate_frames(poses, frame_rate, landmark_rows=None, tables=None, batch_size=ANNOTATE_BATCH_SIZE, draw=True):
+    """Assess injury risk and draw overlays in place for each pose estimation result.
+    
+    Risk is computed by the vectorised engine a small batch of frames at a time.
+    If `landmark_rows` is given, each frame's (33, 4) landmark row is appended to it;
+    if `tables` is given, each batch's FrameTable is, so the clip is never assessed twice.
+    With draw=False frames are yielded untouched.
+    """
+    prior_wrists = []
+    batch = []
+    
+    def _flush():
+        nonlocal prior_wrists
+        frame_indices = [frame_index for frame_index, _, _ in batch]
+        rows = np.stack([landmarks_to_array(results.pose_landmarks) for _, _, results in batch])
+        frame_size = (batch[0][1].shape[1], batch[0][1].shape[0])
+        with timed("assess"):
+            assessment = assess_landmarks(rows, frame_indices, frame_rate, frame_size, prior_wrists)
+        prior_wrists = assessment["prior_wrists"]
+        if landmark_rows is not None:
+            landmark_rows.extend(rows)
+        if tables is not None:
+            tables.append(FrameTable.from_assessment(assessment, frame_indices))
+        for (frame_index, frame, results), record in zip(batch, frame_records(assessment, frame_indices)):
+            if draw and results.pose_landmarks:
+                with timed("draw"):
+                    draw_overlay(frame, results.pose_landmarks, record["injury_risk"], frame_index)
+            yield frame, record
+        batch.clear()
+    
+    for item in poses:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from _flush()
+    if batch:
+        yield from _flush()
+
+def _format_video(output_video_path):
+    if not output_video_path:
+        return "Annotated video: not rendered (analysis only)\n"
+    return f"""Annotated video saved at: {output_video_path}
+Video file exists: {os.path.exists(output_video_path)}
+Video file size: {os.path.getsize(output_video_path) if os.path.exists(output_video_path) else 0} bytes
+"""
+
+def format_analysis_result(results):
+    """Render an analysis result as the text summary returned by the tool."""
+    max_risk = results["max_injury_risk"]
+    return f"""
+Video analysis completed successfully!
+
+Processed {results['total_frames']} frames with {results['frame_rate']:.1f} FPS.
+
+Overall Injury Risk Assessment:
+- Back: {max_risk['back']}
+- Knees: {max_risk['knees']}
+- Shoulders: {max_risk['shoulders']}
+
+{_format_swing(results.get('kinematics'))}{_format_keyframes(results)}Recommended Exercises:
+{chr(10).join([f"• {ex['exercise']}: {ex['description']}" for ex in results['exercises']])}
+
+{_format_video(results['output_video_path'])}"""
+
+def _format_swing(kinematics):
+    if not kinematics:
+        return ""
+    swing = kinematics["swing"]
+    return (
+        f"Swing window: frames {swing['window']['start_frame']}-{swing['window']['end_frame']} ({swing['window']['duration']:.2f}s), "
+        f"peak wrist speed {swing['peak_speed']:.1f} px/s at frame {swing['peak_frame']}\n\n"
+    )
+
+def _format_keyframes(results):
+    metrics = keyframe_metrics(results)
+    if not metrics:
+        return ""
+    lines = ["Swing phases:"]
+    for name, span in results["swing_index"]["phases"].items():
+        if span:
+            lines.append(f"- {name.replace('_', ' ').capitalize()}: frames {span['start_frame']}-{span['end_frame']}")
+    lines.append("Keyframes:")
+    for name, snapshot in metrics.items():
+        angles = ", ".join(f"{angle.replace('_', ' ')} {value:.1f}°" for angle, value in snapshot["angles"].items())
+        lines.append(f"- {name.replace('_', ' ').capitalize()} (frame {snapshot['frame']}): {angles}")
+    return "\n".join(lines) + "\n\n"
+
+def _progress_event(stage, frames_processed, frames_planned):
+    return {"event": "progress", "stage": stage, "frames_processed": frames_processed, "frames_planned": frames_planned}
+
+def _new_output_path():
+    output_video_path = os.path.join("static", "outputs", f"annotated_{uuid.uuid4()}.mp4")
+    os.makedirs(os.path.dirname(output_video_path), exist_ok=True)
+    return output_video_path
+
+def render_overlays(video_path, landmarks, frame_table, start_frame=None, end_frame=None, output_video_path=None):
+    """Draw overlays from stored analysis data, without running pose estimation again.
+    
+    Renders the analysed frames between start_frame and end_frame inclusive
+    (default: the whole clip), reading only those frames from the video.
+    Returns the output path, or None when no frames were written.
+    """
+    frames = frame_table.frame
+    selected = np.ones(len(frames), dtype=bool)
+    if start_frame is not None:
+        selected &= frames >= start_frame
+    if end_frame is not None:
+        selected &= frames <= end_frame
+    rows = np.flatnonzero(selected)
+    if not len(rows):
+        return None
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Error: Could not open video at {video_path}")
+        return None
+    writer = StreamingVideoWriter(output_video_path or _new_output_path(), max(cap.get(cv2.CAP_PROP_FPS), 10.0))
+    # Start decoding at the range rather than the beginning of the clip.
+    cap.set(cv2.CAP_PROP_POS_FRAMES, int(frames[rows[0]]))
+    try:
+        for row, (frame_index, frame) in zip(rows, read_sampled_frames(cap, frames[rows].tolist())):
+            pose_landmarks = array_to_landmarks(landmarks[row])
+            if pose_landmarks:
+                injury_risk = {joint: RISK_LEVELS[level] for joint, level in zip(JOINTS, frame_table.risk[row])}
+                with timed("draw"):
+                    draw_overlay(frame, pose_landmarks, injury_risk, frame_index)
+            if not writer.write(frame):
+                return None
+    finally:
+        writer.close()
+        cap.release()
+    return writer.output_video_path if writer.frames_written else None
+
+def render_keyframe(video_path, landmarks, frame_table, frame):
+    """The analysed frame nearest to `frame` with its overlay drawn, as a BGR image; None if unreadable."""
+    row = frame_table.row(frame)
+    frame_index = int(frame_table.frame[row])
+    cap = cv2.VideoCapture(video_path)
+    try:
+        image = read_frame_at(cap, frame_index)
+    finally:
+        cap.release()
+    if image is None:
+        return None
+    pose_landmarks = array_to_landmarks(landmarks[row])
+    if pose_landmarks:
+        injury_risk = {joint: RISK_LEVELS[level] for joint, level in zip(JOINTS, frame_table.risk[row])}
+        draw_overlay(image, pose_landmarks, injury_risk, frame_index)
+    return image
+
+def iter_analysis(video_path, render=True):
+    """Run pose estimation and biomechanical analysis on a video, yielding events as it goes.
+    
+    With render=False no overlays are drawn and no video is encoded; the
+    results carry output_video_path None and can be rendered later with
+    render_overlays. A cached analysis without a video is rendered from its
+    stored landmarks when render=True.
+    
+    Yields dicts with an "event" key:
+    - "progress": stage, frames_processed, frames_planned
+    - "frame": one frame_data record, plus frames_processed/frames_planned
+    - "result": the summary text and full results, always last on success
+    - "error": message, always last on failure
+    """
     logger.debug(f"Processing video at path: {video_path}")
     try:
         if not os.path.exists(video_path):
             error_msg = f"Error: Video not found at {video_path}"
             logger.error(error_msg)
-            return error_msg
+            yield {"event": "error", "message": error_msg}
+            return
+        
+        key = result_cache.cache_key(result_cache.hash_file(video_path))
+        cached = result_cache.load(key)
+        if cached is not None:
+            results, landmarks = cached
+            total = results["total_frames"]
+            if render and not (results["output_video_path"] and os.path.exists(results["output_video_path"])):
+                yield _progress_event("rendering", 0, total)
+                output_video_path = render_overlays(video_path, landmarks, results["frame_table"])
+                if output_video_path is None:
+                    yield {"event": "error", "message": "Error: Could not create output video file"}
+                    return
+                results.update({
+                    "output_video_path": output_video_path,
+                    "video_exists": True,
+                    "video_size": os.path.getsize(output_video_path)
+                })
+                result_cache.store(key, results, landmarks)
+            for frames_processed, record in enumerate(results["frame_table"].iter_records(), 1):
+                yield {"event": "frame", "frames_processed": frames_processed, "frames_planned": total, "record": record}
+            yield {"event": "result", "summary": format_analysis_result(results), "results": results}
+            return
         
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             error_msg = f"Error: Could not open video at {video_path}"
             logger.error(error_msg)
-            return error_msg
+            yield {"event": "error", "message": error_msg}
+            return
         
         frame_rate = cap.get(cv2.CAP_PROP_FPS)
-        frame_data = []
-        output_frames = []
-        bat_positions = []
+        frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        analysed_frames = []
+        landmark_rows = []
+        batch_tables = []
         frame_count = 0
         
-        while cap.isOpened() and frame_count < 100:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
-            
-            frame_annotated = frame.copy()
-            injury_risk = {"back": "Low", "knees": "Low", "shoulders": "Low"}
-            analysis = {"frame": frame_count, "status": "No pose detected"}
-            
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(
-                    frame_annotated,
-                    results.pose_landmarks,  
-                    mp_pose.POSE_CONNECTIONS,
-                    mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
-                    mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2)
-                )
-                
-                landmarks = results.pose_landmarks.landmark
-                injury_risk, analysis = assess_injury_risk(landmarks, frame_rate, bat_positions)
-                
-                right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST]
-                bat_positions.append([right_wrist.x * frame.shape[1], right_wrist.y * frame.shape[0]])
-                
-                y_offset = 30
-                for joint, risk in injury_risk.items():
-                    color = (0, 0, 255) if risk == "High" else (255, 165, 0) if risk == "Moderate" else (0, 255, 0)
-                    cv2.putText(
-                        frame_annotated,
-                        f"{joint.capitalize()}: {risk}",
-                        (10, y_offset),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7,
-                        color,
-                        2
-                    )
-                    y_offset += 30
-                
-                cv2.putText(
-                    frame_annotated,
-                    f"Frame: {frame_count}",
-                    (10, frame.shape[0] - 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (255, 255, 255),
-                    2
-                )
-            
-            output_frames.append(frame_annotated)
-            frame_data.append({
-                "frame": frame_count,
-                "injury_risk": injury_risk,
-                "analysis": analysis
-            })
-            frame_count += 1
-            
-            if frame_count % 10 == 0:
-                logger.debug(f"Processed {frame_count} frames")
+        writer = StreamingVideoWriter(_new_output_path(), max(frame_rate, 10.0)) if render else None
+        
+        # Each frame is written as soon as it is annotated, so only the
+        # frames sitting in the bounded stage queues are held in memory.
+        stages = []
+        try:
+            # Long clips are covered by a coarse pass plus dense windows around
+            # the swing; short ones are read in full.
+            with borrow_pose() as pose:
+                yield _progress_event("sampling", 0, 0)
+                # With a pose pool the coarse pass is spread across its workers too.
+                infer = None
+                if POSE_WORKERS > 1:
+                    infer = lambda indices: infer_poses_parallel(video_path, indices, POSE_WORKERS)
+                frame_indices, known_results = plan_frame_samples(cap, pose, infer=infer)
+                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                frames_planned = len(frame_indices) if frame_indices is not None else total_frames
+                if POSE_WORKERS > 1 and total_frames > 0:
+                    pending = [i for i in (frame_indices or range(total_frames)) if i not in known_results]
+                    yield _progress_event("pose_inference", 0, frames_planned)
+                    with timed("pose_pool"):
+                        known_results.update(infer_poses_parallel(video_path, pending, POSE_WORKERS))
+                yield _progress_event("analysing", 0, frames_planned)
+                if frame_indices is None:
+                    frames = prefetch(read_frames(cap))
+                else:
+                    frames = prefetch(read_sampled_frames(cap, frame_indices))
+                poses = estimate_poses(frames, pose, known_results=known_results)
+                annotated = annotate_frames(poses, frame_rate, landmark_rows, batch_tables, draw=render)
+                stages = [annotated, poses, frames]
+                for frame_annotated, record in annotated:
+                    if writer is not None and not writer.write(frame_annotated):
+                        yield {"event": "error", "message": "Error: Could not create output video file"}
+                        return
+                    analysed_frames.append(record["frame"])
+                    frame_count += 1
+                    yield {"event": "frame", "frames_processed": frame_count, "frames_planned": frames_planned, "record": record}
+        finally:
+            # Close the stages outermost first, so the prefetch thread is joined
+            # before the capture it reads from is released (early return, or a
+            # streaming client going away).
+            for stage in stages:
+                stage.close()
+            if writer is not None:
+                writer.close()
+            cap.release()
         
-        cap.release()
         logger.debug(f"Video processing completed. Total frames: {frame_count}")
         
-        if output_frames:
-            output_video_path = os.path.join("static", "outputs", f"annotated_{uuid.uuid4()}.mp4")
-            os.makedirs(os.path.dirname(output_video_path), exist_ok=True)
-            
-            height, width = output_frames[0].shape[:2]
-            fourcc = cv2.VideoWriter_fourcc(*'H264')
-            try:
-                out = cv2.VideoWriter(output_video_path, fourcc, max(frame_rate, 10.0), (width, height))
-                if not out.isOpened():
-                    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                    output_video_path = output_video_path.replace('.mp4', '.avi')
-                    out = cv2.VideoWriter(output_video_path, fourcc, max(frame_rate, 10.0), (width, height))
-            except:
-                fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-                output_video_path = output_video_path.replace('.mp4', '.avi')
-                out = cv2.VideoWriter(output_video_path, fourcc, max(frame_rate, 10.0), (width, height))
-            
-            if out.isOpened():
-                for frame in output_frames:
-                    out.write(frame)
-                out.release()
-                logger.debug(f"Video saved successfully: {output_video_path}")
-            else:
-                logger.error("Failed to create video writer")
-                return "Error: Could not create output video file"
+        if frame_count:
+            output_video_path = writer.output_video_path if writer is not None else None
+            logger.debug(f"Video saved successfully: {output_video_path}")
+            yield _progress_event("finalising", frame_count, frames_planned)
             
-            max_risk = {"back": "Low", "knees": "Low", "shoulders": "Low"}
-            for frame in frame_data:
-                for joint, risk in frame["injury_risk"].items():
-                    risk_levels = {"Low": 0, "Moderate": 1, "High": 2}
-                    if risk_levels.get(risk, 0) > risk_levels.get(max_risk[joint], 0):
-                        max_risk[joint] = risk
+            # The batches were assessed in order with the wrist history carried
+            # across, so joining them gives the same table as one whole-clip pass.
+            landmarks = np.stack(landmark_rows)
+            frame_table = FrameTable.concatenate(batch_tables)
+            max_risk = frame_table.max_risk()
             
             exercises = suggest_exercises(max_risk)
             
-            analysis_cache.update({
+            # Smoothed swing kinematics come from the same landmark array, with no extra inference.
+            with timed("kinematics"):
+                kinematics = compute_kinematics(landmarks, analysed_frames, frame_rate, frame_size)
+                # Phase boundaries and keyframes, so follow-up queries and renders can seek straight to them.
+                swing_index = segment_phases(kinematics) if kinematics else None
+            
+            results = {
                 "output_video_path": output_video_path,
-                "frame_data": frame_data,
+                "frame_table": frame_table,
                 "exercises": exercises,
                 "max_injury_risk": max_risk,
                 "total_frames": frame_count,
-                "video_exists": os.path.exists(output_video_path),
-                "video_size": os.path.getsize(output_video_path) if os.path.exists(output_video_path) else 0
-            })
-            
-            logger.debug(f"Analysis cache updated: {analysis_cache}")
-            
-            result = f"""
-Video analysis completed successfully!
-
-Processed {frame_count} frames with {frame_rate:.1f} FPS.
-
-Overall Injury Risk Assessment:
-- Back: {max_risk['back']}
-- Knees: {max_risk['knees']}
-- Shoulders: {max_risk['shoulders']}
-
-Recommended Exercises:
-{chr(10).join([f"• {ex['exercise']}: {ex['description']}" for ex in exercises])}
-
-Annotated video saved at: {output_video_path}
-Video file exists: {os.path.exists(output_video_path)}
-Video file size: {os.path.getsize(output_video_path) if os.path.exists(output_video_path) else 0} bytes
-"""
+                "frame_rate": frame_rate,
+                "video_exists": bool(output_video_path) and os.path.exists(output_video_path),
+                "video_size": os.path.getsize(output_video_path) if output_video_path and os.path.exists(output_video_path) else 0,
+                "kinematics": kinematics_summary(kinematics, swing_index) if kinematics else None,
+                "swing_index": swing_index
+            }
+            result_cache.store(key, results, landmarks)
             
             logger.debug(f"Video processing successful. Output video: {output_video_path}")
-            return result
+            yield {"event": "result", "summary": format_analysis_result(results), "results": results}
         else:
-            return "Error: No frames could be processed from the video."
+            yield {"event": "error", "message": "Error: No frames could be processed from the video."}
     
     except Exception as e:
         logger.error(f"Video processing error: {str(e)}")
-        return f"Error processing video: {str(e)}"
+        yield {"event": "error", "message": f"Error processing video: {str(e)}"}
+
+def analyze_video(video_path, progress=None, render=True):
+    """Run pose estimation and biomechanical analysis on a video.
+    
+    Returns (summary, results); results is None when the analysis failed and
+    summary then holds the error message. `progress`, if given, is called as
+    progress(stage, frames_processed, frames_planned) while the clip is analysed.
+    render=False skips overlay drawing and video encoding (see iter_analysis).
+    """
+    for event in iter_analysis(video_path, render=render):
+        if event["event"] == "result":
+            return event["summary"], event["results"]
+        if event["event"] == "error":
+            return event["message"], None
+        if progress is not None:
+            stage = event.get("stage", "analysing")
+            progress(stage, event["frames_processed"], event["frames_planned"])
 
 @tool
-def advanced_image_processor(thought: str, python_code: str, image_path: str, operation_type: str = "general") -> str:
+def video_pose_estimation_tool(
+    video_path: str,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    operation_type: str = "pose_estimation"
+) -> Command:
+    """Process video for pose estimation and biomechanical analysis.
+    
+    operation_type "pose_estimation" also renders an annotated video;
+    "analysis_only" returns just the risk data and exercises, much faster.
+    """
+    summary, results = analyze_video(video_path, render=operation_type != ANALYSIS_ONLY)
+    update = {"messages": [ToolMessage(summary, tool_call_id=tool_call_id)]}
+    if results:
+        # Results travel with this request's graph state rather than a shared global.
+        update.update({
+            "analysis_results": results,
+            "output_video_path": results["output_video_path"] or ""
+        })
+    return Command(update=update)
+
+@tool
+def advanced_image_processor(
+    thought: str,
+    python_code: str,
+    image_path: str,
+    session_id: Annotated[str, InjectedState("session_id")],
+    operation_type: str = "general"
+) -> str:
     """Advanced image processing tool with OpenCV, PIL, and matplotlib support."""
     logger.debug(f"Processing image at path: {image_path}")
+    session = get_session(session_id)
     
     if not os.path.exists(image_path):
         error_msg = f"Error: Image not found at {image_path}"
         logger.error(error_msg)
         return error_msg
     
+    # One snippet at a time per session, since they share its variables.
+    session.lock.acquire()
     try:
-        current_variables = {
-            "image": cv2.imread(image_path),
-            "pil_image": Image.open(image_path),
-            "image_path": image_path
-        }
-        
-        if current_variables["image"] is None:
-            error_msg = f"Error: Could not load image from {image_path}"
-            logger.error(error_msg)
-            return error_msg
-        
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-        
-        exec_globals = globals().copy()
-        exec_globals.update(persistent_vars)
-        exec_globals.update(current_variables)
-        exec_globals.update({
-            "cv2": cv2,
-            "np": np,
-            "plt": plt,
-            "patches": patches,
-            "Image": Image,
-            "ImageDraw": ImageDraw,
-            "ImageFont": ImageFont,
-            "output_images": [],
-            "analysis_data": {},
-            "detection_results": []
-        })
-        
-        exec(python_code, exec_globals)
-        
-        output = sys.stdout.getvalue()
-        sys.stdout = old_stdout
-        
-        persistent_vars.update({k: v for k, v in exec_globals.items() 
-                               if k not in globals() and not k.startswith('__')})
-        
-        if "output_images" in exec_globals and exec_globals["output_images"]:
-            saved_images = []
-            for i, img in enumerate(exec_globals["output_images"]):
-                image_filename = os.path.join("static", "outputs", f"processed_{uuid.uuid4()}.png")
-                os.makedirs(os.path.dirname(image_filename), exist_ok=True)
-                
-                if isinstance(img, np.ndarray):
-                    cv2.imwrite(image_filename, img)
-                    saved_images.append(image_filename)
-                elif isinstance(img, Image.Image):
-                    img.save(image_filename)
-                    saved_images.append(image_filename)
+        # Decoded once per file and shared with the worker, not re-read on every call.
+        with get_image_store().borrow(image_path) as stored_image:
+            if stored_image is None:
+                error_msg = f"Error: Could not load image from {image_path}"
+                logger.error(error_msg)
+                return error_msg
             
-            persistent_vars["saved_image_paths"] = saved_images
+            # The snippet runs in a sandboxed worker process, never in the server.
+            output, new_variables, saved_images = get_sandbox_pool().run(
+                python_code, session.variables, stored_image.ref, image_path
+            )
+        session.variables.update(new_variables)
+        
+        if saved_images:
+            session.variables["saved_image_paths"] = saved_images
             output += f"\nSaved {len(saved_images)} processed images."
         
         result = f"Image processing completed.\nThought: {thought}\nOutput: {output or 'Operation completed successfully'}"
@@ -363,7 +557,8 @@ def advanced_image_processor(thought: str, python_code: str, image_path: str, op
         return result
     
     except Exception as e:
-        sys.stdout = old_stdout
         error_msg = f"Error: {str(e)}"
         logger.error(error_msg)
         return f"Image processing failed.\nThought: {thought}\nError: {error_msg}"
+    finally:
+        session.lock.release()
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+import cv2
+from config import logger, UPLOAD_DIR, UPLOAD_CHUNK_SIZE, UPLOAD_PROBE_BYTES, UPLOAD_TTL, UPLOAD_EXTENSIONS
+import result_cache
+
+
+class UploadConflict(Exception):
+    """Raised when a chunk does not start at the upload's current offset."""
+
+
+class Upload:
+    """A resumable upload: bytes are appended in order and hashed as they arrive."""
+
+    def __init__(self, upload_id, length, extension):
+        self.id = upload_id
+        self.length = length
+        self.offset = 0
+        self.partial_path = os.path.join(UPLOAD_DIR, f"{upload_id}.{extension}.part")
+        self.video_path = os.path.join(UPLOAD_DIR, f"{upload_id}.{extension}")
+        self.content_hash = None
+        self.metadata = None
+        self.duplicate = False
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self._digest = hashlib.sha256()
+
+    @property
+    def complete(self):
+        return self.content_hash is not None
+
+    def append(self, stream, offset):
+        """Append `stream` at `offset`, which must equal the current offset. Returns the new offset."""
+        with self.lock:
+            self.last_used = time.time()
+            if self.complete or offset != self.offset:
+                raise UploadConflict(f"Upload {self.id} is at offset {self.offset}, not {offset}")
+            with open(self.partial_path, "ab") as f:
+                # A dropped connection leaves whatever arrived; the client resumes from HEAD's offset.
+                try:
+                    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+                        chunk = chunk[:self.length - self.offset]
+                        f.write(chunk)
+                        self._digest.update(chunk)
+                        self.offset += len(chunk)
+                        if self.offset >= self.length:
+                            break
+                finally:
+                    f.flush()
+            if self.metadata is None and (self.offset >= UPLOAD_PROBE_BYTES or self.offset >= self.length):
+                self.metadata = probe_metadata(self.partial_path)
+            if self.offset >= self.length:
+                self._finish()
+            return self.offset
+
+    def _finish(self):
+        self.content_hash = self._digest.hexdigest()
+        existing = _find_by_hash(self.content_hash)
+        if existing is not None:
+            os.remove(self.partial_path)
+            self.video_path = existing
+            self.duplicate = True
+            logger.debug(f"Upload {self.id} duplicates {existing}")
+        else:
+            os.replace(self.partial_path, self.video_path)
+            _remember_by_hash(self.content_hash, self.video_path)
+            logger.debug(f"Upload {self.id} saved to {self.video_path}")
+        if self.metadata is None:
+            self.metadata = probe_metadata(self.video_path)
+        # The analysis cache keys on the same hash, so it need not re-read the file.
+        result_cache.remember_hash(self.video_path, self.content_hash)
+
+
+def probe_metadata(path):
+    """fps, resolution, frame count and duration from the container, or None if it cannot be read yet.
+
+    Works on partial files whose index is at the front (faststart MP4, most
+    phone recordings); other containers are probed again once complete.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    if not width or not height:
+        return None
+    return {
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "frame_count": frame_count,
+        "duration": frame_count / fps if fps else None,
+    }
+
+
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+
+def _hash_index_path(content_hash):
+    # One small file per content hash holding the stored video's path, so the
+    # index survives restarts and is shared by every process using UPLOAD_DIR.
+    return os.path.join(UPLOAD_DIR, ".by_hash", content_hash)
+
+
+def _remember_by_hash(content_hash, video_path):
+    index_path = _hash_index_path(content_hash)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    staging = f"{index_path}.{uuid.uuid4().hex}.tmp"
+    with open(staging, "w") as f:
+        f.write(video_path)
+    os.replace(staging, index_path)
+
+
+def _find_by_hash(content_hash):
+    """Stored video with this content hash, or None; entries whose video is gone are dropped."""
+    index_path = _hash_index_path(content_hash)
+    try:
+        with open(index_path) as f:
+            path = f.read()
+    except FileNotFoundError:
+        return None
+    if not os.path.exists(path):
+        try:
+            os.remove(index_path)
+        except FileNotFoundError:
+            pass
+        return None
+    return path
+
+
+def upload_extension(filename):
+    """Extension to store an upload under: the client's, if it is in UPLOAD_EXTENSIONS, else mp4."""
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    return extension if extension in UPLOAD_EXTENSIONS else 'mp4'
+
+
+def create_upload(length, filename=""):
+    """Register a new upload of `length` bytes."""
+    extension = upload_extension(filename)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload = Upload(str(uuid.uuid4()), length, extension)
+    open(upload.partial_path, "wb").close()
+    with _uploads_lock:
+        _uploads[upload.id] = upload
+    return upload
+
+
+def get_upload(upload_id):
+    """Return the upload for `upload_id`, or None, expiring idle unfinished ones."""
+    now = time.time()
+    with _uploads_lock:
+        for stale_id in [uid for uid, u in _uploads.items() if now - u.last_used > UPLOAD_TTL]:
+            stale = _uploads.pop(stale_id)
+            if not stale.complete and os.path.exists(stale.partial_path):
+                os.remove(stale.partial_path)
+            logger.debug(f"Expired upload {stale_id}")
+        return _uploads.get(upload_id)
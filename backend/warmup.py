@@ -0,0 +1,67 @@
+import threading
+import time
+import numpy as np
+from config import logger, get_llm, POSE_WORKERS, JOB_QUEUE_BACKEND
+
+_status = {"state": "cold", "stages_ms": {}, "error": None}
+_status_lock = threading.Lock()
+_started = False
+
+
+def _stage(name, fn):
+    started = time.perf_counter()
+    fn()
+    with _status_lock:
+        _status["stages_ms"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _dummy_inference():
+    from pipeline import borrow_pose
+    # The instance is returned to the idle pool, so the first request reuses it.
+    with borrow_pose() as pose:
+        pose.process(np.zeros((256, 256, 3), dtype=np.uint8))
+
+
+def warm_up():
+    """Build everything the first request would otherwise pay for, then mark the process ready."""
+    from graph import get_tool_agent
+    from jobs import get_job_runner
+    from pipeline import probe_video_codec
+    from pose_pool import warm_pose_pool
+
+    with _status_lock:
+        _status["state"] = "warming"
+    try:
+        _stage("llm", get_llm)
+        _stage("graph", get_tool_agent)
+        _stage("pose", _dummy_inference)
+        _stage("codec", probe_video_codec)
+        if POSE_WORKERS > 1:
+            _stage("pose_pool", lambda: warm_pose_pool(POSE_WORKERS))
+        if JOB_QUEUE_BACKEND == "sqlite":
+            # Jobs persisted by an earlier process (still queued, or re-queued as
+            # abandoned) run now, not only once a client submits a new one.
+            _stage("jobs", lambda: get_job_runner().start())
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        with _status_lock:
+            _status.update(state="failed", error=str(e))
+        return
+    with _status_lock:
+        _status["state"] = "ready"
+    logger.info(f"Warm-up finished: {_status['stages_ms']}")
+
+
+def start_warm_up():
+    """Run warm_up() once, in a background thread."""
+    global _started
+    with _status_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def warm_up_status():
+    with _status_lock:
+        return {"state": _status["state"], "stages_ms": dict(_status["stages_ms"]), "error": _status["error"]}